@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""Benchmarks for the multi-model chat server
+
+Usage:
+    python3 benchmark.py connect [--queries 200] [--threads 8]
+    python3 benchmark.py load [--jobs 200] [--concurrency 16] [--latency 0.5] [--failure-rate 0.05]
+    python3 benchmark.py keepalive [--workers 4] [--idle 64]
+"""
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import http.client
+import json
+import math
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+import types
+
+import server
+
+def _percentile(samples, fraction):
+    """Get a percentile from a list of samples"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def _time_calls(fn, count, threads):
+    """Call fn count times across a thread pool and return wall and CPU timings"""
+    def timed_call(_):
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    start_cpu = time.process_time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(timed_call, range(count)))
+    return latencies, time.process_time() - start_cpu
+
+def _print_row(label, latencies, cpu_time):
+    """Print one benchmark result row in milliseconds"""
+    print(f"{label:28} "
+          f"{statistics.mean(latencies) * 1000:10.3f} "
+          f"{_percentile(latencies, 0.5) * 1000:10.3f} "
+          f"{_percentile(latencies, 0.99) * 1000:10.3f} "
+          f"{cpu_time * 1000:12.1f}")
+
+def bench_connect(args):
+    """Compare per-query px.connect() against the per-thread connection reuse"""
+    print(f"ProxAI setup overhead for {args.queries} queries on {args.threads} threads")
+    print(f"{'mode':28} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'total cpu ms':>12}")
+
+    # Before: every query opened a fresh connection
+    latencies, cpu_time = _time_calls(server.connect_proxai, args.queries, args.threads)
+    _print_row('connect per query', latencies, cpu_time)
+
+    # After: each worker thread connects once and reuses it
+    latencies, cpu_time = _time_calls(server.ensure_proxai_connection, args.queries, args.threads)
+    _print_row('reuse per thread', latencies, cpu_time)
+
+MOCK_PROVIDERS = ('openai', 'claude', 'gemini', 'mistral', 'grok', 'cohere', 'databricks', 'deepseek')
+
+class MockProvider:
+    """Deterministic stand-in for ProxAI's text generation and model listing
+
+    Latency and failures are drawn from a generator seeded by the call's
+    model and prompt, so a run with the same seed replays the same timings.
+    """
+
+    def __init__(self, models, latency, distribution, failure_rate, seed):
+        self.models = [
+            types.SimpleNamespace(provider=MOCK_PROVIDERS[i % len(MOCK_PROVIDERS)], model=f'mock-{i}')
+            for i in range(models)
+        ]
+        self.latency = latency
+        self.distribution = distribution
+        self.failure_rate = failure_rate
+        self.seed = seed
+
+    def list_models(self, model_size=None):
+        return list(self.models)
+
+    def generate_text(self, system=None, messages=None, provider_model=None, max_tokens=None, temperature=None):
+        key = f'{self.seed}|{provider_model}|{messages[-1]["content"]}'
+        rng = random.Random(hashlib.sha256(key.encode()).digest())
+        time.sleep(self._sample_latency(rng))
+        if rng.random() < self.failure_rate:
+            raise RuntimeError(f'Mock failure from {provider_model[0]}/{provider_model[1]}')
+        return f'{provider_model[1]} answer: ' + ' '.join(['lorem'] * rng.randint(20, max_tokens or 200))
+
+    def _sample_latency(self, rng):
+        if self.distribution == 'fixed':
+            return self.latency
+        if self.distribution == 'uniform':
+            return rng.uniform(0, 2 * self.latency)
+        # Lognormal with the requested mean and a long tail
+        sigma = 0.8
+        return rng.lognormvariate(math.log(self.latency) - sigma ** 2 / 2, sigma)
+
+    def install(self):
+        """Swap the ProxAI entry points the server uses for this mock"""
+        server.px.connect = lambda **kwargs: None
+        server.px.generate_text = self.generate_text
+        server.px.models = types.SimpleNamespace(list_models=self.list_models)
+
+def _load_prompts(path, field):
+    """Read prompts from a JSONL file such as requests.jsonl"""
+    with open(path) as f:
+        prompts = [json.loads(line).get(field, '') for line in f if line.strip()]
+    return [prompt for prompt in prompts if prompt] or ['Hello!']
+
+def _rss_mb():
+    """Get this process's current resident set size in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return float('nan')
+
+class _LoadClient:
+    """One simulated browser: submit a chat, then poll its job and /progress"""
+
+    def __init__(self, port, poll_interval):
+        self.connection = http.client.HTTPConnection('localhost', port, timeout=120)
+        self.poll_interval = poll_interval
+
+    def request(self, method, path, body=None):
+        self.connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                                headers={'Content-Type': 'application/json'})
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def run_job(self, prompt, models):
+        """Run one chat job end to end, returning (latency, status, rejections)"""
+        start = time.perf_counter()
+        rejections = 0
+        while True:
+            status, body = self.request('POST', '/chat', {
+                'message': prompt, 'selected_models': models, 'combiner_model': models[0]
+            })
+            if status != 429:
+                break
+            rejections += 1
+            time.sleep(self.poll_interval)
+        if status != 200:
+            return time.perf_counter() - start, 'rejected', rejections
+
+        job_id = json.loads(body)['job_id']
+        while True:
+            time.sleep(self.poll_interval)
+            self.request('GET', f'/job/{job_id}/progress')
+            self.request('GET', '/progress')
+            job = json.loads(self.request('GET', f'/job/{job_id}')[1])
+            if job['status'] in server.FINISHED_JOB_STATUSES:
+                return time.perf_counter() - start, job['status'], rejections
+
+def bench_load(args):
+    """Drive the HTTP server with concurrent chat jobs against a mock provider"""
+    provider = MockProvider(args.models, args.latency, args.distribution, args.failure_rate, args.seed)
+    provider.install()
+    server.logger.setLevel(args.log_level)
+
+    server.set_available_models(server.get_largest_models())
+    models = server.available_models
+    prompts = _load_prompts(args.prompts, args.prompt_field) if args.prompts else ['Hello!']
+
+    httpd = server.BoundedThreadingHTTPServer(('localhost', 0), server.ChatHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+
+    # Unique prompts keep the response cache from short-circuiting the fan-out
+    job_prompts = iter([f'[{i}] {prompts[i % len(prompts)]}' for i in range(args.jobs)])
+    lock = threading.Lock()
+    outcomes = collections.Counter()
+    latencies = []
+    peak_threads = threading.active_count()
+    peak_rss = _rss_mb()
+    done = threading.Event()
+
+    def sample_resources():
+        nonlocal peak_threads, peak_rss
+        while not done.wait(0.1):
+            peak_threads = max(peak_threads, threading.active_count())
+            peak_rss = max(peak_rss, _rss_mb())
+
+    def client_loop():
+        client = _LoadClient(port, args.poll_interval)
+        while True:
+            with lock:
+                prompt = next(job_prompts, None)
+            if prompt is None:
+                return
+            latency, status, rejections = client.run_job(prompt, models)
+            with lock:
+                outcomes[status] += 1
+                outcomes['429 retries'] += rejections
+                if status == 'completed':
+                    latencies.append(latency)
+
+    print(f"Load test: {args.jobs} jobs, {args.concurrency} clients, {len(models)} mock models, "
+          f"{args.distribution} latency {args.latency}s, failure rate {args.failure_rate}")
+    threading.Thread(target=sample_resources, daemon=True).start()
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client_loop) for _ in range(args.concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    httpd.shutdown()
+
+    print(f"{'jobs/sec':28} {args.jobs / elapsed:10.2f}")
+    if latencies:
+        print(f"{'p50 end-to-end ms':28} {_percentile(latencies, 0.5) * 1000:10.1f}")
+        print(f"{'p99 end-to-end ms':28} {_percentile(latencies, 0.99) * 1000:10.1f}")
+    for status in ('completed', 'error', 'rejected', '429 retries'):
+        print(f"{status:28} {outcomes[status]:10}")
+    print(f"{'peak threads':28} {peak_threads:10}")
+    print(f"{'peak RSS MB':28} {peak_rss:10.1f}")
+    print(f"{'max RSS MB (getrusage)':28} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:10.1f}")
+
+def bench_keepalive(args):
+    """Check that idle keep-alive connections do not hold HTTP workers
+
+    Opens more idle keep-alive connections than the pool has workers, then
+    times a request on a fresh connection. Exits non-zero if it waited on
+    an idle connection instead of being answered right away.
+    """
+    server.logger.setLevel('CRITICAL')
+    httpd = server.BoundedThreadingHTTPServer(('localhost', 0), server.ChatHandler, max_workers=args.workers)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+
+    idle_clients = []
+    for _ in range(args.idle):
+        client = _LoadClient(port, 0)
+        client.request('GET', '/progress')
+        idle_clients.append(client)
+    # Give the last connections a moment to be parked
+    deadline = time.monotonic() + 2
+    while httpd.parked_connections() < args.idle and time.monotonic() < deadline:
+        time.sleep(0.01)
+    parked = httpd.parked_connections()
+
+    latencies = []
+    for _ in range(args.requests):
+        client = _LoadClient(port, 0)
+        start = time.perf_counter()
+        status, _ = client.request('GET', '/progress')
+        latencies.append(time.perf_counter() - start)
+        client.connection.close()
+
+    # The idle connections are still usable for another request
+    reused = sum(client.request('GET', '/progress')[0] == 200 for client in idle_clients)
+    httpd.shutdown()
+    httpd.server_close()
+
+    print(f"{args.idle} idle keep-alive connections on {args.workers} HTTP workers")
+    print(f"{'parked connections':28} {parked:10}")
+    print(f"{'p50 new request ms':28} {_percentile(latencies, 0.5) * 1000:10.1f}")
+    print(f"{'max new request ms':28} {max(latencies) * 1000:10.1f}")
+    print(f"{'idle connections reused':28} {reused:10}")
+    if max(latencies) > args.max_latency or reused != args.idle:
+        print('FAIL: idle connections delayed new requests')
+        sys.exit(1)
+    print('OK')
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-model chat benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    connect_parser = subparsers.add_parser('connect', help='ProxAI connection setup overhead')
+    connect_parser.add_argument('--queries', type=int, default=200, help='Simulated model queries')
+    connect_parser.add_argument('--threads', type=int, default=8, help='Worker threads')
+    connect_parser.set_defaults(run=bench_connect)
+
+    load_parser = subparsers.add_parser('load', help='End-to-end HTTP load test against a mock provider')
+    load_parser.add_argument('--jobs', type=int, default=200, help='Chat jobs to run')
+    load_parser.add_argument('--concurrency', type=int, default=16, help='Concurrent simulated clients')
+    load_parser.add_argument('--models', type=int, default=8, help='Mock models in the catalog')
+    load_parser.add_argument('--latency', type=float, default=0.5, help='Mean mock model latency in seconds')
+    load_parser.add_argument('--distribution', choices=('fixed', 'uniform', 'lognormal'), default='lognormal',
+                             help='Mock latency distribution')
+    load_parser.add_argument('--failure-rate', type=float, default=0.05, help='Share of mock calls that fail')
+    load_parser.add_argument('--poll-interval', type=float, default=0.1, help='Seconds between client polls')
+    load_parser.add_argument('--prompts', metavar='FILE', help='JSONL file to draw prompts from')
+    load_parser.add_argument('--prompt-field', default='body', help='Prompt field in the --prompts file')
+    load_parser.add_argument('--seed', type=int, default=0, help='Seed for mock latencies and failures')
+    load_parser.add_argument('--log-level', default='CRITICAL', help='Server log level during the run')
+    load_parser.set_defaults(run=bench_load)
+
+    keepalive_parser = subparsers.add_parser('keepalive', help='New requests are not blocked by idle keep-alive clients')
+    keepalive_parser.add_argument('--workers', type=int, default=4, help='HTTP worker threads')
+    keepalive_parser.add_argument('--idle', type=int, default=64, help='Idle keep-alive connections to open')
+    keepalive_parser.add_argument('--requests', type=int, default=20, help='Timed requests on fresh connections')
+    keepalive_parser.add_argument('--max-latency', type=float, default=1.0, help='Slowest acceptable request in seconds')
+    keepalive_parser.set_defaults(run=bench_keepalive)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()
@@ -1,412 +1,3302 @@
 #!/usr/bin/env python3
+import argparse
 import json
+import logging
+import logging.handlers
 import proxai as px
+import atexit
+import bisect
+import collections
 import concurrent.futures
+import contextlib
+import gzip
+import hashlib
+import math
+import socket
+import sqlite3
+import subprocess
 import time
 import random
+import re
+import selectors
+import signal
 import threading
 import uuid
 import os
+import queue
+import sys
 from datetime import datetime
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 
-chat_history = []
+try:
+    import brotli  # Optional: smaller payloads for browsers that accept br
+except ImportError:
+    brotli = None
+
+# HTTP serving configuration
+HTTP_MAX_WORKERS = int(os.getenv('HTTP_MAX_WORKERS', '64'))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '15'))
+HTTP_LISTEN_BACKLOG = int(os.getenv('HTTP_LISTEN_BACKLOG', '1024'))
+SSE_HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT_INTERVAL', '15'))
+SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', '4096'))  # open event streams before clients are told to poll
+SSE_MAX_BUFFER = int(os.getenv('SSE_MAX_BUFFER', str(4 * 2 ** 20)))  # unsent bytes before a slow stream is dropped
+STATIC_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', '300'))  # Cache-Control max-age for css and images
+
+# Model catalog configuration
+MODEL_CATALOG_PATH = os.getenv('MODEL_CATALOG_PATH', os.path.join(STATIC_DIR, '.model_catalog.json'))
+MODEL_CATALOG_REFRESH_INTERVAL = float(os.getenv('MODEL_CATALOG_REFRESH_INTERVAL', '3600'))  # seconds
+
+# Logging configuration
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()  # INFO, SUCCESS, WARNING or ERROR
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'pretty')  # 'pretty' colored lines or 'json' lines
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))  # share of high-frequency events logged
+
+# Scheduling configuration
+MODEL_QUERY_MAX_WORKERS = int(os.getenv('MODEL_QUERY_MAX_WORKERS', '32'))
+MODEL_QUERY_PROVIDER_LIMIT = int(os.getenv('MODEL_QUERY_PROVIDER_LIMIT', '4'))
+MODEL_QUERY_PROVIDER_LIMITS = os.getenv('MODEL_QUERY_PROVIDER_LIMITS', '')  # e.g. "openai=8,claude=2"
+JOB_MAX_CONCURRENT = int(os.getenv('JOB_MAX_CONCURRENT', '8'))
+JOB_MAX_QUEUED = int(os.getenv('JOB_MAX_QUEUED', '32'))
+BATCH_MAX_CONCURRENT = int(os.getenv('BATCH_MAX_CONCURRENT', '16'))  # batch prompts processed at once
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))  # prompts accepted per /chat/batch request
+
+# Multi-process configuration
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', '1'))  # >1 runs that many server processes on one port
+WORKER_INDEX = os.getenv('WORKER_INDEX')  # Set by the supervisor in each worker process
+WORKER_POLL_INTERVAL = float(os.getenv('WORKER_POLL_INTERVAL', '0.25'))  # seconds between shared queue polls
+WORKER_SESSION_AFFINITY_WAIT = float(os.getenv('WORKER_SESSION_AFFINITY_WAIT', '5'))  # seconds a job waits for its session's worker
+
+# ProxAI connection configuration
+PROXAI_EXPERIMENT_PATH = 'multi_model_chat/version_1'
+PROXAI_CONNECTION_MAX_AGE = float(os.getenv('PROXAI_CONNECTION_MAX_AGE', '3600'))
+
+# Fan-out completion policy defaults (overridable per request)
+MODEL_QUERY_DEADLINE = float(os.getenv('MODEL_QUERY_DEADLINE', '0'))  # seconds, 0 = no deadline
+MODEL_QUERY_QUORUM = int(os.getenv('MODEL_QUERY_QUORUM', '0'))  # successes needed, 0 = all models
+MODEL_QUERY_HEDGE = os.getenv('MODEL_QUERY_HEDGE', '0') == '1'
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+PROGRESSIVE_COMBINE = os.getenv('PROGRESSIVE_COMBINE', '0') == '1'  # combine while responses still arrive
+PROGRESSIVE_FIRST_BATCH = int(os.getenv('PROGRESSIVE_FIRST_BATCH', '3'))  # successes before the first synthesis
+
+# Pre-combine reduction configuration
+RESPONSE_REDUCTION = os.getenv('RESPONSE_REDUCTION', '1') == '1'  # cluster near-duplicate responses
+REDUCTION_SIMILARITY = float(os.getenv('REDUCTION_SIMILARITY', '0.5'))  # shingle Jaccard that counts as a duplicate
+REDUCTION_SHINGLE_SIZE = int(os.getenv('REDUCTION_SHINGLE_SIZE', '3'))  # words per shingle
+COMBINE_MAX_PROMPT_CHARS = int(os.getenv('COMBINE_MAX_PROMPT_CHARS', '12000'))  # response text per combiner prompt
+
+# Job tracing configuration
+JOB_TRACE = os.getenv('JOB_TRACE', '1') == '1'  # record a span tree per job for /job/<id>/trace
+TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', '500'))  # spans kept per job, later ones are counted as dropped
+TRACE_EXPORT_DIR = os.getenv('TRACE_EXPORT_DIR', '')  # directory for Chrome-trace files of finished jobs
+
+# Adaptive routing configuration
+MODEL_STATS_WINDOW = int(os.getenv('MODEL_STATS_WINDOW', '50'))  # recent outcomes used for error rates
+MODEL_STATS_EWMA_ALPHA = float(os.getenv('MODEL_STATS_EWMA_ALPHA', '0.2'))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))  # consecutive failures that open a circuit
+CIRCUIT_ERROR_RATE = float(os.getenv('CIRCUIT_ERROR_RATE', '0.5'))  # windowed error rate that opens a circuit
+CIRCUIT_MIN_REQUESTS = int(os.getenv('CIRCUIT_MIN_REQUESTS', '10'))  # outcomes needed before the error rate counts
+CIRCUIT_COOLDOWN = float(os.getenv('CIRCUIT_COOLDOWN', '60'))  # seconds a circuit stays open before a trial query
+
+# Response cache configuration
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '1024'))  # entries, 0 disables the cache
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))  # seconds
+RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', '')  # SQLite file for the on-disk backend
+
+# Conversation session configuration
+SESSION_MAX_MESSAGES = int(os.getenv('SESSION_MAX_MESSAGES', '40'))  # kept per session, oldest dropped first
+SESSION_IDLE_TIMEOUT = float(os.getenv('SESSION_IDLE_TIMEOUT', '3600'))  # seconds before an idle session is evicted
+SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', '10000'))
+
+# History windowing and summarization configuration
+HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', '4000'))  # history tokens sent per query
+HISTORY_TOKEN_BUDGETS = os.getenv('HISTORY_TOKEN_BUDGETS', '')  # per provider, e.g. "openai=8000,mistral=2000"
+HISTORY_SUMMARY_TRIGGER_TOKENS = int(os.getenv('HISTORY_SUMMARY_TRIGGER_TOKENS', '3000'))  # 0 disables summaries
+HISTORY_KEEP_RECENT_MESSAGES = int(os.getenv('HISTORY_KEEP_RECENT_MESSAGES', '6'))
+HISTORY_MAX_SUMMARIES = int(os.getenv('HISTORY_MAX_SUMMARIES', '10'))
+
+# Job store configuration
+JOB_TTL = float(os.getenv('JOB_TTL', '3600'))  # seconds a finished job stays in memory
+JOB_MAX_IN_MEMORY = int(os.getenv('JOB_MAX_IN_MEMORY', '10000'))
+JOB_STORE_STRIPES = int(os.getenv('JOB_STORE_STRIPES', '16'))
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', '')  # SQLite file that persists finished jobs
+JOB_IDLE_CANCEL = float(os.getenv('JOB_IDLE_CANCEL', '120'))  # seconds unwatched before a job is cancelled, 0 disables
+CANCEL_CHECK_INTERVAL = float(os.getenv('CANCEL_CHECK_INTERVAL', '0.25'))  # seconds between fan-out cancellation checks
+JOB_STORE_RETENTION = float(os.getenv('JOB_STORE_RETENTION', str(7 * 24 * 3600)))  # seconds kept on disk
+
 available_models = []
-current_progress = {
-    'is_processing': False,
-    'total_models': 0,
-    'completed_models': 0,
-    'successful_models': 0,
-    'failed_models': 0,
-    'current_stage': 'idle',  # 'querying', 'combining', 'completed'
-    'start_time': None,
-    'completed_responses': []
-}
 
 # Job tracking system
-jobs = {}  # job_id -> job_info
-job_lock = threading.Lock()
+latest_job_id = None  # Served by the legacy /progress endpoint
 
-def _get_log_colors():
-    """Get color codes for log levels"""
-    return {
-        'INFO': '\033[94m',    # Blue
-        'SUCCESS': '\033[92m', # Green
-        'WARNING': '\033[93m', # Yellow
-        'ERROR': '\033[91m',   # Red
-        'RESET': '\033[0m'     # Reset
-    }
+SUCCESS = 25  # Between INFO and WARNING so LOG_LEVEL=SUCCESS keeps outcomes but drops progress chatter
+logging.addLevelName(SUCCESS, 'SUCCESS')
+
+LOG_COLORS = {
+    'INFO': '\033[94m',    # Blue
+    'SUCCESS': '\033[92m', # Green
+    'WARNING': '\033[93m', # Yellow
+    'ERROR': '\033[91m',   # Red
+    'RESET': '\033[0m'     # Reset
+}
 
 def _format_log_details(details, color, reset):
     """Format log details for display"""
     if isinstance(details, dict):
-        for key, value in details.items():
-            print(f"         {color}├─{reset} {key}: {value}")
+        return [f"         {color}├─{reset} {key}: {value}" for key, value in details.items()]
     elif isinstance(details, list):
-        for item in details:
-            print(f"         {color}├─{reset} {item}")
+        return [f"         {color}├─{reset} {item}" for item in details]
     else:
-        print(f"         {color}└─{reset} {details}")
+        return [f"         {color}└─{reset} {details}"]
 
-def log_message(level, message, details=None):
-    """Pretty logging with timestamps and formatting"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    colors = _get_log_colors()
-    color = colors.get(level, colors['RESET'])
-    reset = colors['RESET']
+class PrettyLogFormatter(logging.Formatter):
+    """Colored console lines with indented details"""
 
-    log_line = f"{color}[{timestamp}] {level:8} | {message}{reset}"
-    print(log_line)
+    def format(self, record):
+        timestamp = datetime.fromtimestamp(record.created).strftime("%H:%M:%S")
+        color = LOG_COLORS.get(record.levelname, LOG_COLORS['RESET'])
+        reset = LOG_COLORS['RESET']
+        worker = f"w{WORKER_INDEX} " if WORKER_INDEX is not None else ''
+        lines = [f"{color}[{timestamp}] {worker}{record.levelname:8} | {record.getMessage()}{reset}"]
+        if record.details:
+            lines.extend(_format_log_details(record.details, color, reset))
+        return '\n'.join(lines)
 
-    if details:
-        _format_log_details(details, color, reset)
+class JSONLogFormatter(logging.Formatter):
+    """One JSON object per line for log shippers"""
 
-def create_job(request_data):
-    """Create a new job and return job ID"""
-    job_id = str(uuid.uuid4())
-    with job_lock:
-        jobs[job_id] = {
-            'id': job_id,
-            'status': 'pending',  # 'pending', 'processing', 'completed', 'error'
-            'result': None,
-            'error': None,
-            'created_at': time.time(),
-            'request_data': request_data
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'thread': record.threadName
         }
-    return job_id
+        if WORKER_INDEX is not None:
+            entry['worker'] = WORKER_INDEX
+        if record.details:
+            entry['details'] = record.details
+        return json.dumps(entry, ensure_ascii=False, default=str)
 
-def get_job(job_id):
-    """Get job information"""
-    with job_lock:
-        return jobs.get(job_id)
+def _configure_logging():
+    """Send records through a queue so request threads never block on stdout"""
+    logger = logging.getLogger('multi_model_chat')
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
 
-def update_job(job_id, **updates):
-    """Update job information"""
-    with job_lock:
-        if job_id in jobs:
-            jobs[job_id].update(updates)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONLogFormatter() if LOG_FORMAT == 'json' else PrettyLogFormatter())
+    listener = logging.handlers.QueueListener(queue.SimpleQueue(), stream_handler)
+    logger.addHandler(logging.handlers.QueueHandler(listener.queue))
+    listener.start()
+    atexit.register(listener.stop)  # Flush queued records on shutdown
+    return logger, stream_handler
 
-def _should_skip_model(provider, model_name):
-    """Check if a model should be skipped during selection"""
-    return provider == 'deepseek' and model_name == 'deepseek-r1'
+logger, log_stream_handler = _configure_logging()
 
-def _create_model_entry(provider, model_name):
-    """Create a standardized model entry"""
-    return {
-        'provider': provider,
-        'model': model_name,
-        'display_name': f"{provider.title()} {model_name.replace('-', ' ').title()}"
-    }
+def log_message(level, message, details=None, sampled=False):
+    """Log a message with optional details; sampled events keep only LOG_SAMPLE_RATE of calls"""
+    levelno = logging.getLevelName(level)
+    if not logger.isEnabledFor(levelno):
+        return
+    if sampled and random.random() >= LOG_SAMPLE_RATE:
+        return
+    logger.log(levelno, message, extra={'details': details})
 
-def _add_deepseek_v3_alternative(selected_models):
-    """Add deepseek-v3 if no deepseek models are selected"""
-    if any(m['provider'] == 'deepseek' for m in selected_models):
-        return selected_models
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
 
-    try:
-        log_message('INFO', '🔍 Checking for deepseek-v3 alternative...')
-        all_models = px.models.list_models()
-        deepseek_v3 = next((m for m in all_models if m.provider == 'deepseek' and m.model == 'deepseek-v3'), None)
-        if deepseek_v3:
-            selected_models.append(_create_model_entry('deepseek', 'deepseek-v3'))
-            log_message('SUCCESS', '✅ Added deepseek-v3 as alternative')
-        else:
-            log_message('WARNING', '⚠️  No deepseek-v3 alternative found')
-    except Exception as e:
-        log_message('WARNING', f'⚠️  Could not check for deepseek-v3: {str(e)}')
+class MetricsRegistry:
+    """Prometheus-style counters and histograms kept in process memory
 
-    return selected_models
+    Recording is a dict lookup and an addition under one lock, cheap enough to
+    leave on for every request. Gauges are read from the live schedulers and
+    stores by collectors when /metrics is scraped.
+    """
 
-def get_largest_models():
-    """Get the largest models from each provider, excluding deepseek-r1"""
-    log_message('INFO', '🔍 Loading available AI models...')
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}  # name -> (type, help, buckets)
+        self._values = collections.defaultdict(dict)  # name -> label tuple -> value or histogram
+        self._collectors = []
+
+    def counter(self, name, help_text):
+        self._metrics[name] = ('counter', help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._metrics[name] = ('histogram', help_text, tuple(buckets))
+
+    def gauge(self, name, help_text):
+        self._metrics[name] = ('gauge', help_text, None)
+
+    def add_collector(self, collector):
+        """Register a callable yielding (name, labels, value) at scrape time"""
+        self._collectors.append(collector)
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        buckets = self._metrics[name][2]
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            series = self._values[name]
+            histogram = series.get(key)
+            if histogram is None:
+                # Per-bucket counts (last slot is +Inf), then sum
+                histogram = series[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        collected = collections.defaultdict(dict)
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    collected[name][tuple(sorted(labels.items()))] = value
+            except Exception as e:
+                log_message('WARNING', f'📉 Metrics collector failed: {str(e)}')
+
+        with self._lock:
+            values = {name: {key: list(v) if isinstance(v, list) else v for key, v in series.items()}
+                      for name, series in self._values.items()}
+
+        lines = []
+        for name, (metric_type, help_text, buckets) in self._metrics.items():
+            series = values.get(name) or collected.get(name) or {}
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for key, value in sorted(series.items()):
+                if metric_type != 'histogram':
+                    lines.append(f'{name}{_format_metric_labels(key)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), value):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_metric_labels(key + (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_metric_labels(key)} {round(value[-1], 6)}')
+                lines.append(f'{name}_count{_format_metric_labels(key)} {cumulative}')
+        return '\n'.join(lines) + '\n'
 
+def _format_metric_labels(key):
+    """Format a label tuple as {name="value",...}"""
+    if not key:
+        return ''
+    pairs = []
+    for label, value in key:
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{label}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+metrics = MetricsRegistry()
+metrics.histogram('chat_model_query_seconds', 'Latency of a single model query')
+metrics.histogram('chat_combiner_seconds', 'Latency of the combiner model call')
+metrics.histogram('chat_queue_wait_seconds', 'Time spent waiting for a job or model query slot')
+metrics.histogram('chat_http_request_seconds', 'HTTP request handling latency per route')
+metrics.histogram('chat_prompt_chars', 'Characters sent to a model per query', SIZE_BUCKETS)
+metrics.histogram('chat_response_chars', 'Characters received from a model per query', SIZE_BUCKETS)
+metrics.counter('chat_jobs_total', 'Chat jobs by outcome')
+metrics.gauge('chat_jobs', 'Chat jobs currently queued or running')
+metrics.gauge('chat_model_queries', 'Model queries currently queued or running per provider')
+metrics.counter('chat_response_cache_lookups_total', 'Response cache lookups by result')
+metrics.counter('chat_response_cache_coalesced_total', 'Generations coalesced onto an identical in-flight call')
+metrics.gauge('chat_model_circuit_open', 'Models currently skipped by their circuit breaker')
+metrics.gauge('chat_event_streams', 'Open Server-Sent Event streams')
+
+class JobTrace:
+    """Span tree with wall-clock start/end times for the stages of one job
+
+    Spans are plain dicts appended under a lock, so model threads can open
+    and close spans for the same job concurrently. A span's end stays None
+    while it is open. Serialized as a nested tree for /job/<id>/trace or as
+    Chrome trace events for chrome://tracing and Perfetto.
+    """
+
+    def __init__(self, job_id, started_at):
+        self.job_id = job_id
+        self._lock = threading.Lock()
+        self.spans = []
+        self.dropped = 0
+        self.saved_at = None  # set on traces loaded from the job store
+        self.root = self.start('job', None, started_at=started_at)
+
+    def to_record(self):
+        """Get the raw spans as a JSON-serializable record for the job store"""
+        with self._lock:
+            spans = [dict(span, attrs=dict(span['attrs'])) for span in self.spans]
+            return {'job_id': self.job_id, 'spans': spans, 'dropped': self.dropped, 'saved_at': time.time()}
+
+    @classmethod
+    def from_record(cls, record):
+        """Rebuild a trace saved by to_record; spans still open then end at saved_at"""
+        trace = cls.__new__(cls)
+        trace.job_id = record['job_id']
+        trace._lock = threading.Lock()
+        trace.spans = record['spans']
+        trace.dropped = record['dropped']
+        trace.saved_at = record['saved_at']
+        trace.root = trace.spans[0]
+        return trace
+
+    def start(self, name, parent, started_at=None, **attrs):
+        """Open a span under parent (None for the root) and return it"""
+        span = {
+            'name': name,
+            'parent_id': parent['id'] if parent is not None else None,
+            'start': started_at or time.time(),
+            'end': None,
+            'thread': threading.current_thread().name,
+            'attrs': attrs
+        }
+        with self._lock:
+            span['id'] = len(self.spans)
+            # Past the cap, spans are still timed by their callers but not kept
+            if len(self.spans) >= TRACE_MAX_SPANS:
+                self.dropped += 1
+            else:
+                self.spans.append(span)
+        return span
+
+    def annotate(self, span, **attrs):
+        """Add attributes to a span"""
+        with self._lock:
+            span['attrs'].update(attrs)
+
+    def end(self, span, **attrs):
+        """Close a span, adding any final attributes"""
+        with self._lock:
+            span['attrs'].update(attrs)
+            if span['end'] is None:
+                span['end'] = time.time()
+
+    def record(self, name, parent, started_at, ended_at, **attrs):
+        """Add a span that has already finished"""
+        span = self.start(name, parent, started_at, **attrs)
+        span['end'] = ended_at
+        return span
+
+    def to_dict(self):
+        """Serialize the span tree with times in ms relative to the job's start"""
+        with self._lock:
+            spans = [dict(span, attrs=dict(span['attrs'])) for span in self.spans]
+            dropped = self.dropped
+        origin = self.root['start']
+        now = self.saved_at or time.time()
+        nodes = {}
+        for span in spans:
+            end = span['end'] if span['end'] is not None else now
+            nodes[span['id']] = {
+                'name': span['name'],
+                'start_ms': round((span['start'] - origin) * 1000, 1),
+                'duration_ms': round((end - span['start']) * 1000, 1),
+                'open': span['end'] is None,
+                'thread': span['thread'],
+                'attrs': span['attrs'],
+                'children': []
+            }
+        for span in spans:
+            if span['parent_id'] in nodes:
+                nodes[span['parent_id']]['children'].append(nodes[span['id']])
+        tree = nodes[self.root['id']]
+        return {
+            'job_id': self.job_id,
+            'started_at': origin,
+            'duration_ms': tree['duration_ms'],
+            'critical_path': _critical_path(tree),
+            'dropped_spans': dropped,
+            'root': tree
+        }
+
+    def to_chrome(self):
+        """Serialize the spans as Chrome trace events (complete events per span)"""
+        with self._lock:
+            spans = [dict(span, attrs=dict(span['attrs'])) for span in self.spans]
+        origin = self.root['start']
+        now = self.saved_at or time.time()
+        thread_ids = {}
+        events = []
+        for span in spans:
+            tid = thread_ids.setdefault(span['thread'], len(thread_ids) + 1)
+            end = span['end'] if span['end'] is not None else now
+            events.append({
+                'name': span['name'],
+                'cat': 'job',
+                'ph': 'X',
+                'ts': round((span['start'] - origin) * 1e6),
+                'dur': round((end - span['start']) * 1e6),
+                'pid': 1,
+                'tid': tid,
+                'args': dict(span['attrs'], open=True) if span['end'] is None else span['attrs']
+            })
+        for thread_name, tid in thread_ids.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': thread_name}})
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': f'job {self.job_id}'}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def _critical_path(node):
+    """Follow the child that finished last from the root down to a leaf"""
+    path = []
+    while True:
+        path.append({'name': node['name'], 'duration_ms': node['duration_ms'], **node['attrs']})
+        if not node['children']:
+            return path
+        node = max(node['children'], key=lambda child: child['start_ms'] + child['duration_ms'])
+
+# The job span each thread is currently working under, if any
+_trace_context = threading.local()
+
+def _current_span():
+    trace = getattr(_trace_context, 'trace', None)
+    return (trace, _trace_context.span) if trace is not None else (None, None)
+
+@contextlib.contextmanager
+def trace_span(name, **attrs):
+    """Record a span under this thread's current span; does nothing outside a traced job"""
+    trace, parent = _current_span()
+    if trace is None:
+        yield None
+        return
+
+    span = trace.start(name, parent, **attrs)
+    _trace_context.span = span
     try:
-        largest_models = px.models.list_models(model_size='largest')
-        log_message('SUCCESS', f'✅ Retrieved {len(largest_models)} models from ProxAI')
+        yield span
+    except BaseException as e:
+        trace.annotate(span, error=str(e))
+        raise
+    finally:
+        _trace_context.span = parent
+        trace.end(span)
 
-        selected_models = []
-        filtered_count = 0
+def annotate_span(**attrs):
+    """Add attributes to this thread's current span"""
+    trace, span = _current_span()
+    if trace is not None:
+        trace.annotate(span, **attrs)
 
-        for model in largest_models:
-            provider = model.provider
-            model_name = model.model
+@contextlib.contextmanager
+def activate_trace(trace, span):
+    """Make span the current span of this thread for the duration of the block"""
+    previous = _current_span()
+    _trace_context.trace, _trace_context.span = trace, span
+    try:
+        yield
+    finally:
+        _trace_context.trace, _trace_context.span = previous
 
-            if _should_skip_model(provider, model_name):
-                filtered_count += 1
-                log_message('INFO', f'⚠️  Skipping {provider}/{model_name} (filtered out)')
+def traced(fn, name, **attrs):
+    """Wrap fn so it runs in a new span under the caller's current span on whichever thread runs it
+
+    The span opens at hand-off, so time spent waiting for a worker thread
+    shows up as a 'waiting' child span.
+    """
+    trace, parent = _current_span()
+    if trace is None:
+        return fn
+
+    span = trace.start(name, parent, **attrs)
+
+    def run(*args, **kwargs):
+        # The span belongs to the thread doing the work, not the one that handed it off
+        span['thread'] = threading.current_thread().name
+        trace.record('waiting', span, span['start'], time.time())
+        with activate_trace(trace, span):
+            try:
+                return fn(*args, **kwargs)
+            except BaseException as e:
+                trace.annotate(span, error=str(e))
+                raise
+            finally:
+                trace.end(span)
+
+    # Closes the span of a call that was dropped before it ran
+    run.abandon = lambda **end_attrs: trace.end(span, **end_attrs)
+    return run
+
+FINISHED_JOB_STATUSES = ('completed', 'error', 'cancelled')
+
+class MemoryJobStore:
+    """Lock-striped in-memory job store with TTL and size-based eviction
+
+    Jobs are spread over independent stripes by id, so lookups from pollers
+    and updates from job threads rarely contend on the same lock. Each stripe
+    keeps jobs in creation order and evicts finished jobs once they are older
+    than ttl or the stripe is over its share of max_jobs. Running jobs are
+    never evicted.
+    """
+
+    def __init__(self, ttl, max_jobs, stripes):
+        self.ttl = ttl
+        self.stripe_capacity = max(1, max_jobs // stripes)
+        self._stripes = [(threading.Lock(), collections.OrderedDict()) for _ in range(stripes)]
+        self.evictions = 0
+
+    def _stripe(self, job_id):
+        return self._stripes[hash(job_id) % len(self._stripes)]
+
+    def create(self, job):
+        """Add a new job"""
+        lock, stripe = self._stripe(job['id'])
+        with lock:
+            stripe[job['id']] = job
+            self._evict(stripe)
+
+    def get(self, job_id):
+        """Get a job, or None if it is unknown or evicted"""
+        return self.get_live(job_id)
+
+    def get_live(self, job_id):
+        """Get a job that is still held in memory with its runtime state"""
+        lock, stripe = self._stripe(job_id)
+        with lock:
+            return stripe.get(job_id)
+
+    def update(self, job_id, **updates):
+        """Update job fields, stamping finished_at when the job finishes"""
+        lock, stripe = self._stripe(job_id)
+        with lock:
+            job = stripe.get(job_id)
+            if job is None:
+                return None
+            if updates.get('status') in FINISHED_JOB_STATUSES:
+                updates.setdefault('finished_at', time.time())
+            job.update(updates)
+            return job
+
+    def checkpoint(self, job_id):
+        """Publish a running job's progress to other processes (nothing to do in memory)"""
+
+    def save_trace(self, job_id):
+        """Store a finished job's closed trace with it (nothing to do in memory)"""
+
+    def touch(self, job_id):
+        """Record that a client is still watching a job"""
+        job = self.get_live(job_id)
+        if job is not None:
+            job['last_seen'] = time.time()
+
+    def last_seen(self, job):
+        """Get when a client last polled or streamed a live job"""
+        return job['last_seen']
+
+    def live_jobs(self):
+        """Get the unfinished jobs held in this process"""
+        jobs = []
+        for lock, stripe in self._stripes:
+            with lock:
+                jobs.extend(job for job in stripe.values() if job['status'] not in FINISHED_JOB_STATUSES)
+        return jobs
+
+    def discard(self, job_id):
+        """Remove a job"""
+        lock, stripe = self._stripe(job_id)
+        with lock:
+            stripe.pop(job_id, None)
+
+    def stats(self):
+        """Get job counts by status"""
+        counts = collections.Counter()
+        for lock, stripe in self._stripes:
+            with lock:
+                counts.update(job['status'] for job in stripe.values())
+        return {'in_memory': sum(counts.values()), 'by_status': dict(counts), 'evictions': self.evictions}
+
+    def _evict(self, stripe):
+        now = time.time()
+        over_capacity = len(stripe) - self.stripe_capacity
+        for job_id, job in list(stripe.items()):
+            finished_at = job.get('finished_at')
+            if finished_at is None:
                 continue
+            if over_capacity > 0 or now - finished_at >= self.ttl:
+                del stripe[job_id]
+                self.evictions += 1
+                over_capacity -= 1
+            else:
+                # Jobs are kept in creation order, so the rest are newer
+                break
 
-            selected_models.append(_create_model_entry(provider, model_name))
-            log_message('INFO', f'✅ Added model: {provider}/{model_name}')
+class SQLiteJobStore(MemoryJobStore):
+    """Job store that also persists finished jobs to SQLite
 
-        selected_models = _add_deepseek_v3_alternative(selected_models)
+    Running jobs live in memory as usual. Once a job finishes, its public
+    fields are written to disk, so it can be served after it leaves memory
+    and after a restart.
+    """
 
-        log_message('SUCCESS', f'🎯 Model selection complete!', {
-            'Total available': len(largest_models),
-            'Filtered out': filtered_count,
-            'Final selection': len(selected_models)
-        })
+    def __init__(self, path, ttl, max_jobs, stripes, retention):
+        super().__init__(ttl, max_jobs, stripes)
+        self.path = path
+        self.retention = retention
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs '
+            '(id TEXT PRIMARY KEY, status TEXT, result TEXT, error TEXT, created_at REAL, '
+            'finished_at REAL, progress TEXT, late_results TEXT, trace TEXT)'
+        )
+        # Files written before traces were stored lack the column
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(jobs)')]
+        if 'trace' not in columns:
+            self._db.execute('ALTER TABLE jobs ADD COLUMN trace TEXT')
+        self._db.execute('DELETE FROM jobs WHERE finished_at < ?', (time.time() - retention,))
+        self._db.commit()
 
-        return selected_models
+    def get(self, job_id):
+        job = self.get_live(job_id)
+        if job is not None:
+            return job
 
-    except Exception as e:
-        log_message('ERROR', f'❌ Failed to load models: {str(e)}')
-        return []
+        with self._db_lock:
+            row = self._db.execute(
+                'SELECT id, status, result, error, created_at, finished_at, progress, late_results, trace '
+                'FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'status': row[1],
+            'result': row[2],
+            'error': row[3],
+            'created_at': row[4],
+            'finished_at': row[5],
+            'progress': json.loads(row[6]),
+            'late_results': json.loads(row[7]),
+            'trace': json.loads(row[8]) if row[8] else None  # a JobTrace record
+        }
 
-def _create_success_result(model, response, time_taken):
-    """Create a successful query result"""
+    def update(self, job_id, **updates):
+        job = super().update(job_id, **updates)
+        if job is None:
+            # Finished jobs that left memory can still gain late results
+            job = self.get(job_id)
+            if job is None:
+                return None
+            job.update(updates)
+
+        if job['status'] in FINISHED_JOB_STATUSES:
+            self._persist(job)
+        return job
+
+    def save_trace(self, job_id):
+        job = self.get_live(job_id)
+        if job is not None and job['status'] in FINISHED_JOB_STATUSES:
+            self._persist(job)
+
+    def _persist(self, job):
+        row = self._job_row(job)
+        with self._db_lock:
+            self._db.execute(self.UPSERT_JOB, row)
+            self._db.commit()
+
+    UPSERT_JOB = (
+        'INSERT OR REPLACE INTO jobs '
+        '(id, status, result, error, created_at, finished_at, progress, late_results, trace) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'
+    )
+
+    def _job_row(self, job):
+        progress = job['progress']
+        late_results = job['late_results']
+        if 'events_cond' in job:
+            with job['events_cond']:
+                progress = dict(progress, completed_responses=list(progress['completed_responses']))
+                late_results = list(late_results)
+        # Traces are written once the job finishes; stored jobs carry their record along
+        trace = job.get('trace')
+        if isinstance(trace, JobTrace):
+            trace = trace.to_record() if job['status'] in FINISHED_JOB_STATUSES else None
+        return (job['id'], job['status'], job['result'], job['error'], job['created_at'],
+                job['finished_at'], json.dumps(progress), json.dumps(late_results),
+                json.dumps(trace) if trace else None)
+
+class SharedJobStore(SQLiteJobStore):
+    """SQLite job store and FIFO job queue shared by worker processes
+
+    Every job change is written through, so whichever worker receives a
+    /job/<id> poll can answer it. Queued jobs wait in a table until a worker
+    with a free job slot claims them, preferring the worker that last ran the
+    same session so its conversation history stays in one process. Polls and
+    cancellations for a job running in another worker are left in tables
+    that the owning worker reads.
+    """
+
+    def __init__(self, path, ttl, max_jobs, stripes, retention, worker_id):
+        super().__init__(path, ttl, max_jobs, stripes, retention)
+        self.worker_id = worker_id
+        self._seen_written = {}  # job id -> last job_seen write from this process
+        with self._db_lock:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS job_queue '
+                '(id TEXT PRIMARY KEY, request_data TEXT, session_id TEXT, owner TEXT, enqueued_at REAL)'
+            )
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS session_owners '
+                '(session_id TEXT PRIMARY KEY, owner TEXT, claimed_at REAL)'
+            )
+            # Cross-process signals for jobs owned by another worker
+            self._db.execute('CREATE TABLE IF NOT EXISTS job_seen (id TEXT PRIMARY KEY, seen_at REAL)')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS job_cancellations (id TEXT PRIMARY KEY, reason TEXT, requested_at REAL)'
+            )
+            self._db.commit()
+        self.prune_session_owners()
+
+    def create(self, job):
+        super().create(job)
+        self._persist(job)
+
+    def update(self, job_id, **updates):
+        job = super().update(job_id, **updates)
+        if job is not None and job['status'] not in FINISHED_JOB_STATUSES:
+            self._persist(job)
+        return job
+
+    def checkpoint(self, job_id):
+        job = self.get_live(job_id)
+        if job is not None:
+            self._persist(job)
+
+    def enqueue(self, job, max_queued):
+        """Store a pending job and queue it, returning its position or None when full"""
+        session_id = job['request_data']['session_id']
+        with self._db_lock:
+            queued = self._db.execute('SELECT COUNT(*) FROM job_queue').fetchone()[0]
+            if queued >= max_queued:
+                return None
+            owner = self._db.execute(
+                'SELECT owner FROM session_owners WHERE session_id = ?', (session_id,)
+            ).fetchone()
+            # The job row goes first so a claiming worker never overwrites a newer status
+            self._db.execute(self.UPSERT_JOB, self._job_row(job))
+            # Queued at the job's creation time, so the claiming worker can time the whole wait
+            self._db.execute(
+                'INSERT INTO job_queue (id, request_data, session_id, owner, enqueued_at) VALUES (?, ?, ?, ?, ?)',
+                (job['id'], json.dumps(job['request_data']), session_id, owner[0] if owner else None,
+                 job['created_at'])
+            )
+            self._db.commit()
+        return queued + 1
+
+    def claim(self):
+        """Take the oldest queued job this worker should run as (id, request data, created at), or None"""
+        with self._db_lock:
+            row = self._db.execute(
+                'SELECT id, request_data, session_id, enqueued_at FROM job_queue '
+                'WHERE owner IS NULL OR owner = ? OR enqueued_at < ? ORDER BY enqueued_at LIMIT 1',
+                (self.worker_id, time.time() - WORKER_SESSION_AFFINITY_WAIT)
+            ).fetchone()
+            if row is None:
+                return None
+            # Another worker may have claimed the same row since the SELECT
+            claimed = self._db.execute('DELETE FROM job_queue WHERE id = ?', (row[0],)).rowcount
+            if claimed:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO session_owners (session_id, owner, claimed_at) VALUES (?, ?, ?)',
+                    (row[2], self.worker_id, time.time())
+                )
+            self._db.commit()
+        return (row[0], json.loads(row[1]), row[3]) if claimed else None
+
+    def queue_position(self, job_id):
+        """Get a queued job's 1-based position (0 once a worker claimed it)"""
+        with self._db_lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM job_queue WHERE enqueued_at <= '
+                '(SELECT enqueued_at FROM job_queue WHERE id = ?)', (job_id,)
+            ).fetchone()[0]
+
+    def touch(self, job_id):
+        if self.get_live(job_id) is not None:
+            super().touch(job_id)
+            return
+        # Pollers hit several times a second; a sighting per second is plenty
+        now = time.time()
+        if now - self._seen_written.get(job_id, 0) < 1:
+            return
+        self._seen_written[job_id] = now
+        with self._db_lock:
+            self._db.execute('INSERT OR REPLACE INTO job_seen (id, seen_at) VALUES (?, ?)', (job_id, time.time()))
+            self._db.commit()
+
+    def last_seen(self, job):
+        # Polls may land on any worker, so take the latest sighting from all of them
+        with self._db_lock:
+            row = self._db.execute('SELECT seen_at FROM job_seen WHERE id = ?', (job['id'],)).fetchone()
+        return max(job['last_seen'], row[0]) if row else job['last_seen']
+
+    def request_cancel(self, job_id, reason):
+        """Cancel a job this process does not hold, returning False if it already finished"""
+        with self._db_lock:
+            dequeued = self._db.execute('DELETE FROM job_queue WHERE id = ?', (job_id,)).rowcount
+            if dequeued:
+                # Never claimed, so it can be finished right here
+                self._db.execute(
+                    "UPDATE jobs SET status = 'cancelled', error = ?, finished_at = ? WHERE id = ?",
+                    (reason, time.time(), job_id)
+                )
+            else:
+                row = self._db.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+                if row is None or row[0] in FINISHED_JOB_STATUSES:
+                    self._db.commit()
+                    return False
+                # The owning worker's dispatcher picks this up
+                self._db.execute(
+                    'INSERT OR REPLACE INTO job_cancellations (id, reason, requested_at) VALUES (?, ?, ?)',
+                    (job_id, reason, time.time())
+                )
+            self._db.commit()
+        return True
+
+    def take_cancellations(self):
+        """Remove and return cancellation requests for jobs held in this process"""
+        with self._db_lock:
+            rows = self._db.execute('SELECT id, reason, requested_at FROM job_cancellations').fetchall()
+        taken = []
+        for job_id, reason, requested_at in rows:
+            # Requests for jobs that finished meanwhile expire instead of piling up
+            if self.get_live(job_id) is not None or time.time() - requested_at > 60:
+                with self._db_lock:
+                    self._db.execute('DELETE FROM job_cancellations WHERE id = ?', (job_id,))
+                    self._db.commit()
+                if self.get_live(job_id) is not None:
+                    taken.append((job_id, reason))
+        return taken
+
+    def prune_session_owners(self):
+        """Forget session affinities older than the session idle timeout"""
+        with self._db_lock:
+            self._db.execute('DELETE FROM session_owners WHERE claimed_at < ?', (time.time() - SESSION_IDLE_TIMEOUT,))
+            self._db.execute('DELETE FROM job_seen WHERE seen_at < ?', (time.time() - SESSION_IDLE_TIMEOUT,))
+            self._db.commit()
+        self._seen_written.clear()
+
+def _create_job_store():
+    """Create the configured job store backend"""
+    if WORKER_PROCESSES > 1:
+        # Worker processes always share one SQLite file
+        path = JOB_STORE_PATH or os.path.join(STATIC_DIR, '.jobs.sqlite')
+        return SharedJobStore(path, JOB_TTL, JOB_MAX_IN_MEMORY, JOB_STORE_STRIPES, JOB_STORE_RETENTION,
+                              WORKER_INDEX or 'supervisor')
+    if JOB_STORE_PATH:
+        return SQLiteJobStore(JOB_STORE_PATH, JOB_TTL, JOB_MAX_IN_MEMORY, JOB_STORE_STRIPES, JOB_STORE_RETENTION)
+    return MemoryJobStore(JOB_TTL, JOB_MAX_IN_MEMORY, JOB_STORE_STRIPES)
+
+job_store = _create_job_store()
+
+def _create_progress():
+    """Create the initial progress state for a job"""
     return {
-        'model': model,
-        'response': response,
-        'time_taken': time_taken,
-        'success': True
+        'is_processing': False,
+        'total_models': 0,
+        'completed_models': 0,
+        'successful_models': 0,
+        'failed_models': 0,
+        'current_stage': 'idle',  # 'querying', 'combining', 'completed'
+        'start_time': None,
+        'completed_responses': [],
+        'provisional_result': None,  # latest progressive synthesis, if any
+        'reduction': None  # pre-combine reduction statistics
     }
 
-def _create_error_result(model, error, time_taken):
-    """Create a failed query result"""
+def _new_job(request_data, job_id=None, created_at=None):
+    """Build a pending job record with its progress lock and event stream"""
+    job_id = job_id or str(uuid.uuid4())
+    created_at = created_at or time.time()
     return {
-        'model': model,
-        'response': None,
-        'time_taken': time_taken,
-        'success': False,
-        'error': str(error)
+        'id': job_id,
+        'status': 'pending',  # 'pending', 'processing', 'completed', 'error', 'cancelled'
+        'result': None,
+        'error': None,
+        'created_at': created_at,
+        'finished_at': None,
+        'request_data': request_data,
+        'progress': _create_progress(),
+        'late_results': [],
+        # Server-Sent Events stream: ordered (event_type, data) pairs
+        'events': [],
+        'events_closed': False,
+        'late_pending': 0,  # model calls still expected to attach a late result
+        # Per-job lock for progress and events, so concurrent jobs never contend
+        'events_cond': threading.Condition(),
+        # Cancellation: set by DELETE /job/<id> or when no client has watched the job for a while
+        'cancel_event': threading.Event(),
+        'last_seen': time.time(),
+        'idle_cancel': True,
+        # Span tree served at /job/<id>/trace
+        'trace': JobTrace(job_id, created_at) if JOB_TRACE else None
     }
 
-def query_single_model(model, user_message, chat_history):
-    """Query a single model and return result with timing"""
-    # Ensure ProxAI connection in thread for multiprocessing compatibility
-    px.connect(
-        experiment_path='multi_model_chat/version_1',
-        proxdash_options=px.ProxDashOptions(
-            api_key=os.getenv('PROXDASH_API_KEY'),
-        ))
+def create_job(request_data, job_id=None, created_at=None):
+    """Create a new job and return job ID"""
+    global latest_job_id
+    job = _new_job(request_data, job_id, created_at)
+    job_store.create(job)
+    latest_job_id = job['id']
+    return job['id']
 
-    model_name = f"{model['provider']}/{model['model']}"
-    log_message('INFO', f'🚀 Querying {model_name}...')
+def get_job(job_id):
+    """Get job information, including finished jobs served from disk"""
+    return job_store.get(job_id)
 
-    start_time = time.time()
-    try:
-        response = px.generate_text(
-            system="You are a helpful AI assistant. Be conversational and engaging.",
-            messages=chat_history,
-            provider_model=(model['provider'], model['model']),
-            max_tokens=500,
-            temperature=0.7
+def get_live_job(job_id):
+    """Get a job still held in memory with its progress lock and event stream"""
+    return job_store.get_live(job_id)
+
+def update_job(job_id, **updates):
+    """Update job information"""
+    job_store.update(job_id, **updates)
+
+def discard_job(job_id):
+    """Remove a job that was never scheduled"""
+    job_store.discard(job_id)
+
+def advance_job(job_id, status, final_event=None, **updates):
+    """Move a live job to a new status unless it has already finished
+
+    The job thread and cancel_job race to settle a job. The check and the
+    update happen under the job's own lock, so a cancelled job is never
+    revived or completed afterwards. final_event is an (event_type, data)
+    pair published as the last event of the job's stream. Returns False if
+    the job had already finished.
+    """
+    job = get_live_job(job_id)
+    if not job:
+        return False
+
+    with job['events_cond']:
+        if job['status'] in FINISHED_JOB_STATUSES:
+            return False
+        update_job(job_id, status=status, **updates)
+        if final_event is not None:
+            publish_job_event(job_id, *final_event, final=True)
+    return True
+
+def job_cancelled(job_id):
+    """Check whether a job has been asked to stop"""
+    job = get_live_job(job_id)
+    return job is not None and job['cancel_event'].is_set()
+
+def cancel_job(job_id, reason):
+    """Cancel a live job, returning False if it had already finished
+
+    Queued model queries are dropped and the combine step is skipped. Provider
+    calls already on the wire cannot be interrupted; their results are
+    discarded when they arrive.
+    """
+    job = get_live_job(job_id)
+    if not job:
+        return False
+
+    job['cancel_event'].set()
+    if not advance_job(job_id, 'cancelled', ('job_cancelled', {'error': reason}), error=reason):
+        return False
+    update_job_progress(job_id, current_stage='idle', is_processing=False)
+    metrics.inc('chat_jobs_total', outcome='cancelled')
+    log_message('WARNING', f'🛑 Job {job_id} cancelled', {'Reason': reason})
+    return True
+
+def touch_job(job_id):
+    """Note that a client polled or streamed a job, keeping it from idle cancellation"""
+    job_store.touch(job_id)
+
+def _cancel_idle_jobs_loop():
+    """Cancel jobs that no client has polled or streamed within JOB_IDLE_CANCEL"""
+    while True:
+        time.sleep(min(JOB_IDLE_CANCEL / 4, 5))
+        now = time.time()
+        for job in job_store.live_jobs():
+            try:
+                idle = now - job_store.last_seen(job)
+            except sqlite3.Error as e:
+                log_message('WARNING', f'⚠️  Could not read when job {job["id"]} was last watched: {str(e)}')
+                continue
+            if job['idle_cancel'] and idle >= JOB_IDLE_CANCEL:
+                cancel_job(job['id'], f'No client watched the job for {JOB_IDLE_CANCEL:g}s')
+
+def start_idle_job_reaper():
+    """Start the thread that cancels abandoned jobs"""
+    thread = threading.Thread(target=_cancel_idle_jobs_loop, name='idle-job-reaper', daemon=True)
+    thread.start()
+
+def update_job_progress(job_id, **updates):
+    """Update a job's progress fields under the job's own lock"""
+    job = get_live_job(job_id)
+    if not job:
+        return
+
+    with job['events_cond']:
+        job['progress'].update(updates)
+    job_store.checkpoint(job_id)
+
+def record_model_completion(job_id, completed_response):
+    """Count a finished model query against a job and return the new counters"""
+    job = get_live_job(job_id)
+    if not job:
+        return None
+
+    with job['events_cond']:
+        progress = job['progress']
+        progress['completed_models'] += 1
+        if completed_response['success']:
+            progress['successful_models'] += 1
+        else:
+            progress['failed_models'] += 1
+        progress['completed_responses'].append(completed_response)
+
+        counters = {
+            'total_models': progress['total_models'],
+            'completed_models': progress['completed_models'],
+            'successful_models': progress['successful_models'],
+            'failed_models': progress['failed_models']
+        }
+    job_store.checkpoint(job_id)
+    return counters
+
+def get_job_progress(job_id):
+    """Get a consistent snapshot of a job's progress for the frontend"""
+    job = get_job(job_id)
+    if not job:
+        return None
+
+    if 'events_cond' not in job:
+        # Finished job loaded from disk; its progress is already a snapshot
+        progress = dict(job['progress'])
+    else:
+        with job['events_cond']:
+            progress = dict(job['progress'])
+            progress['completed_responses'] = list(progress['completed_responses'])
+
+    # Calculate elapsed time if processing
+    start_time = progress.pop('start_time')
+    progress['elapsed_time'] = int(time.time() - start_time) if start_time else 0
+    return progress
+
+def publish_job_event(job_id, event_type, data, final=False):
+    """Append an event to a job's stream and wake any SSE subscribers"""
+    job = get_live_job(job_id)
+    if not job:
+        return
+
+    with job['events_cond']:
+        # Only late results follow the final event, not e.g. deltas from calls a cancellation discarded
+        if job['events_closed'] and event_type != 'model_late':
+            return
+        job['events'].append((event_type, data))
+        if final:
+            job['events_closed'] = True
+        job['events_cond'].notify_all()
+    event_streams.notify(job_id)
+
+def expect_late_result(job_id, future):
+    """Attach a still-running model call's result to its job when it finishes
+
+    Until then the job's event streams stay open past the final event, so
+    subscribers also receive the model_late event.
+    """
+    job = get_live_job(job_id)
+    if job:
+        with job['events_cond']:
+            job['late_pending'] += 1
+
+    def settle(f):
+        try:
+            if not f.cancelled():
+                attach_late_result(job_id, f.result())
+        finally:
+            if job:
+                with job['events_cond']:
+                    job['late_pending'] -= 1
+                event_streams.notify(job_id)
+
+    future.add_done_callback(settle)
+
+def attach_late_result(job_id, result):
+    """Attach a model result that arrived after its job stopped waiting for it"""
+    late_result = {
+        'model_name': _model_name(result['model']),
+        'display_name': result['model']['display_name'],
+        'success': result['success'],
+        'time_taken': result['time_taken'],
+        'response': result['response'],
+        'error': result.get('error')
+    }
+
+    job = get_job(job_id)
+    if not job:
+        return
+    if 'events_cond' in job:
+        with job['events_cond']:
+            job['late_results'].append(late_result)
+            late_results = list(job['late_results'])
+        publish_job_event(job_id, 'model_late', late_result)
+    else:
+        late_results = job['late_results'] + [late_result]
+    # Writes the late result through to disk for finished jobs
+    update_job(job_id, late_results=late_results)
+
+    status = "✅" if result['success'] else "❌"
+    log_message('INFO', f"{status} Late result attached to job {job_id}: {late_result['model_name']}")
+
+def _parse_provider_limits(spec):
+    """Parse a "provider=limit,..." string into a dict"""
+    limits = {}
+    for item in spec.split(','):
+        if '=' in item:
+            provider, limit = item.split('=', 1)
+            limits[provider.strip()] = int(limit)
+    return limits
+
+class ModelQueryScheduler:
+    """Process-wide executor for model queries with per-provider concurrency caps
+
+    Queries wait in a per-provider FIFO until their provider is below its limit,
+    so a burst for one provider neither occupies every worker nor floods that
+    provider's rate limits.
+    """
+
+    def __init__(self, max_workers, provider_limit, provider_limits=None):
+        self.max_workers = max_workers
+        self.provider_limit = provider_limit
+        self.provider_limits = provider_limits or {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='model-query'
         )
+        self._lock = threading.Lock()
+        self._pending = collections.defaultdict(collections.deque)  # provider -> queued calls
+        self._running = collections.defaultdict(int)  # provider -> calls in flight
 
-        time_taken = round(time.time() - start_time, 2)
+    def submit(self, provider, fn, *args, **kwargs):
+        """Queue fn for a provider and return a Future for its result"""
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._pending[provider].append((future, fn, args, kwargs, time.perf_counter()))
+        self._dispatch(provider)
+        return future
 
-        log_message('SUCCESS', f'✅ {model_name} responded successfully', {
-            'Response time': f'{time_taken}s',
-            'Response length': f'{len(response)} chars'
-        })
+    def snapshot(self):
+        """Get queued and running counts per provider"""
+        with self._lock:
+            providers = set(self._pending) | set(self._running)
+            return {
+                provider: {
+                    'queued': len(self._pending[provider]),
+                    'running': self._running[provider]
+                }
+                for provider in sorted(providers)
+            }
 
-        return _create_success_result(model, response, time_taken)
+    def _dispatch(self, provider):
+        ready = []
+        with self._lock:
+            queue = self._pending[provider]
+            limit = self.provider_limits.get(provider, self.provider_limit)
+            while queue and self._running[provider] < limit:
+                call = queue.popleft()
+                # Skip calls whose future was cancelled while queued
+                if call[0].set_running_or_notify_cancel():
+                    self._running[provider] += 1
+                    ready.append(call)
+
+        for call in ready:
+            self._executor.submit(self._run, provider, *call)
+
+    def _run(self, provider, future, fn, args, kwargs, queued_at):
+        metrics.observe('chat_queue_wait_seconds', time.perf_counter() - queued_at, queue='model_query')
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._running[provider] -= 1
+            self._dispatch(provider)
+
+class JobScheduler:
+    """Runs chat jobs on a fixed pool with a bounded FIFO admission queue"""
+
+    def __init__(self, max_concurrent, max_queued):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrent,
+            thread_name_prefix='chat-job'
+        )
+        self._lock = threading.Lock()
+        self._waiting = collections.OrderedDict()  # job_id -> admission time, in admission order
+        self._running = 0
+
+    def try_submit(self, job_id, fn, *args):
+        """Admit a job, returning its queue position or None when saturated"""
+        with self._lock:
+            if len(self._waiting) >= self.max_queued:
+                return None
+            self._waiting[job_id] = time.perf_counter()
+            position = self._position(job_id)
+
+        self._executor.submit(self._run, job_id, fn, args)
+        return position
+
+    def queue_position(self, job_id):
+        """Get a waiting job's 1-based queue position (0 once it is running)"""
+        with self._lock:
+            return self._position(job_id)
+
+    def snapshot(self):
+        """Get the number of queued and running jobs"""
+        with self._lock:
+            return {'queued': len(self._waiting), 'running': self._running}
+
+    def _position(self, job_id):
+        if job_id not in self._waiting:
+            return 0
+        # Jobs beyond the free worker slots are the ones actually waiting
+        index = list(self._waiting).index(job_id)
+        return max(0, index + 1 - (self.max_concurrent - self._running))
+
+    def _run(self, job_id, fn, args):
+        with self._lock:
+            admitted_at = self._waiting.pop(job_id, None)
+            self._running += 1
+        if admitted_at is not None:
+            metrics.observe('chat_queue_wait_seconds', time.perf_counter() - admitted_at, queue='job')
+        try:
+            fn(job_id, *args)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+class ResponseCache:
+    """Content-addressed LRU + TTL cache for generated text
+
+    Entries live in memory up to max_entries. When a path is given they are
+    also written to SQLite, so they survive restarts and memory misses fall
+    back to disk.
+    """
+
+    def __init__(self, max_entries, ttl, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> (value, time_taken, created_at)
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'saved_seconds': 0.0}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(key TEXT PRIMARY KEY, value TEXT, time_taken REAL, created_at REAL)'
+            )
+            self._db.execute('DELETE FROM responses WHERE created_at < ?', (time.time() - ttl,))
+            self._db.commit()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """Get a cached value, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[2] >= self.ttl:
+                del self._entries[key]
+                entry = None
+
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    'SELECT value, time_taken, created_at FROM responses WHERE key = ? AND created_at >= ?',
+                    (key, now - self.ttl)
+                ).fetchone()
+                if row:
+                    entry = tuple(row)
+                    self._stats['disk_hits'] += 1
+                    self._store_in_memory(key, entry)
+
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            self._stats['saved_seconds'] += entry[1]
+            return entry[0]
+
+    def put(self, key, value, time_taken):
+        """Store a value along with how long it took to generate"""
+        entry = (value, time_taken, time.time())
+        with self._lock:
+            self._store_in_memory(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO responses (key, value, time_taken, created_at) VALUES (?, ?, ?, ?)',
+                    (key, *entry)
+                )
+                self._db.commit()
+
+    def stats(self):
+        """Get hit/miss counters and the generation time saved by hits"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['saved_seconds'] = round(stats['saved_seconds'], 2)
+        return stats
+
+    def _store_in_memory(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+class CoalescedCallError(Exception):
+    """Raised in callers that joined an in-flight call which then failed"""
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into a single execution
+
+    The first caller for a key runs the call; callers arriving while it is in
+    flight wait for the same result. Partial output is replayed to late joiners
+    and forwarded to every caller as it arrives. If the call fails, joiners
+    get a CoalescedCallError chained to the original exception, so only the
+    caller that ran it counts the failure.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> {'future', 'chunks', 'listeners'}
+        self.coalesced = 0
+
+    def do(self, key, fn, on_delta=None):
+        """Run fn(publish_delta) once per in-flight key; returns (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'future': concurrent.futures.Future(), 'chunks': [], 'listeners': []}
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+                if on_delta is not None:
+                    for chunk in call['chunks']:
+                        on_delta(chunk)
+            if on_delta is not None:
+                call['listeners'].append(on_delta)
+
+        if not leader:
+            try:
+                return call['future'].result(), True
+            except Exception as e:
+                raise CoalescedCallError(str(e)) from e
+
+        def publish_delta(chunk):
+            with self._lock:
+                call['chunks'].append(chunk)
+                listeners = list(call['listeners'])
+            for listener in listeners:
+                listener(chunk)
+
+        try:
+            result = fn(publish_delta)
+        except BaseException as e:
+            call['future'].set_exception(e)
+            raise
+        else:
+            call['future'].set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+def estimate_tokens(text):
+    """Estimate a text's token count (roughly four characters per token)"""
+    return len(text) // 4 + 1
+
+class SessionStore:
+    """Per-session conversation histories with size limits and idle eviction
+
+    Messages are stored as (seq, role, content, tokens) tuples in a bounded
+    deque, so each session keeps at most max_messages turns and token counts
+    are computed once per message. Older turns can be folded into summaries,
+    which are kept alongside the recent messages. Sessions are kept in LRU
+    order and evicted once idle for longer than idle_timeout or when there
+    are more than max_sessions.
+    """
+
+    def __init__(self, max_messages, idle_timeout, max_sessions):
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = collections.OrderedDict()  # session_id -> session state
+        self.evictions = 0
+
+    def append(self, session_id, role, content):
+        """Append a message to a session"""
+        with self._lock:
+            session = self._touch(session_id)
+            session['next_seq'] += 1
+            session['messages'].append((session['next_seq'], role, content, estimate_tokens(content)))
+
+    def build_context(self, session_id, token_budget):
+        """Get the most recent history that fits a token budget
+
+        Recent messages are taken newest first until the budget is spent (the
+        latest message is always included). Remaining budget goes to the
+        newest summaries, which are prepended as an exchange so the roles keep
+        alternating.
+        """
+        with self._lock:
+            session = self._touch(session_id)
+            messages = list(session['messages'])
+            summaries = list(session['summaries'])
+
+        window = []
+        used_tokens = 0
+        for _, role, content, tokens in reversed(messages):
+            if window and used_tokens + tokens > token_budget:
+                break
+            window.append({'role': role, 'content': content})
+            used_tokens += tokens
+        window.reverse()
+
+        # Conversations must open with a user turn
+        while len(window) > 1 and window[0]['role'] != 'user':
+            window.pop(0)
+
+        included_summaries = []
+        for summary, tokens in reversed(summaries):
+            if used_tokens + tokens > token_budget:
+                break
+            included_summaries.insert(0, summary)
+            used_tokens += tokens
+
+        if included_summaries:
+            window = [
+                {'role': 'user', 'content': 'Summary of our earlier conversation:\n\n' + '\n\n'.join(included_summaries)},
+                {'role': 'assistant', 'content': "Thanks, I'll keep that context in mind."}
+            ] + window
+        return window
+
+    def claim_for_summary(self, session_id, trigger_tokens, keep_recent):
+        """Claim the oldest turns for summarization once they pass trigger_tokens
+
+        Returns (last_seq, messages) and marks the session as summarizing, or
+        None when there is nothing to do.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session['summarizing']:
+                return None
+
+            messages = list(session['messages'])
+            # Cut just before a user turn (or after a reply at the very end), so
+            # no user turn is split from its reply and the remaining history
+            # still starts with a user turn
+            split = max(0, len(messages) - keep_recent)
+            while split > 0 and (messages[split][1] != 'user' if split < len(messages)
+                                 else messages[-1][1] != 'assistant'):
+                split -= 1
+            candidates = messages[:split]
+            if not candidates or sum(m[3] for m in candidates) < trigger_tokens:
+                return None
+
+            session['summarizing'] = True
+            return candidates[-1][0], [{'role': role, 'content': content} for _, role, content, _ in candidates]
+
+    def store_summary(self, session_id, last_seq, summary):
+        """Replace the summarized turns with their summary"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session['summarizing'] = False
+            if summary is None:
+                return
+            while session['messages'] and session['messages'][0][0] <= last_seq:
+                session['messages'].popleft()
+            session['summaries'].append((summary, estimate_tokens(summary)))
+
+    def stats(self):
+        """Get session counts for monitoring"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'messages': sum(len(s['messages']) for s in self._sessions.values()),
+                'summaries': sum(len(s['summaries']) for s in self._sessions.values()),
+                'evictions': self.evictions
+            }
+
+    def _touch(self, session_id):
+        now = time.time()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = {
+                'messages': collections.deque(maxlen=self.max_messages),
+                'summaries': collections.deque(maxlen=HISTORY_MAX_SUMMARIES),  # (text, tokens), oldest first
+                'next_seq': 0,
+                'summarizing': False,
+                'last_active': now
+            }
+            self._sessions[session_id] = session
+        session['last_active'] = now
+        self._sessions.move_to_end(session_id)
+        self._evict(now)
+        return session
+
+    def _evict(self, now):
+        # Least recently active sessions sit at the front
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - oldest['last_active'] < self.idle_timeout:
+                break
+            del self._sessions[oldest_id]
+            self.evictions += 1
+
+model_query_scheduler = ModelQueryScheduler(
+    MODEL_QUERY_MAX_WORKERS,
+    MODEL_QUERY_PROVIDER_LIMIT,
+    _parse_provider_limits(MODEL_QUERY_PROVIDER_LIMITS)
+)
+job_scheduler = JobScheduler(JOB_MAX_CONCURRENT, JOB_MAX_QUEUED)
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH or None)
+generation_flights = SingleFlight()
+session_store = SessionStore(SESSION_MAX_MESSAGES, SESSION_IDLE_TIMEOUT, SESSION_MAX_COUNT)
+history_token_budgets = _parse_provider_limits(HISTORY_TOKEN_BUDGETS)
+
+# Per-thread ProxAI connection state; worker threads are long-lived, so each
+# connects once and reuses the session for every query it runs
+_proxai_connection = threading.local()
+
+def connect_proxai():
+    """Open a ProxAI connection with experiment tracking"""
+    px.connect(
+        experiment_path=PROXAI_EXPERIMENT_PATH,
+        proxdash_options=px.ProxDashOptions(
+            api_key=os.getenv('PROXDASH_API_KEY'),
+        ))
+
+def ensure_proxai_connection():
+    """Connect ProxAI once per thread, reconnecting when stale or unhealthy"""
+    connected_at = getattr(_proxai_connection, 'connected_at', None)
+    if (connected_at is not None
+            and _proxai_connection.healthy
+            and time.monotonic() - connected_at < PROXAI_CONNECTION_MAX_AGE):
+        return False
+
+    with trace_span('px.connect'):
+        connect_proxai()
+    _proxai_connection.connected_at = time.monotonic()
+    _proxai_connection.healthy = True
+    log_message('INFO', f'🔌 ProxAI connection opened for {threading.current_thread().name}')
+    return True
+
+def check_proxai_connection_error(error):
+    """Flag this thread's connection for a reconnect after a transport failure"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        _proxai_connection.healthy = False
+
+def _should_skip_model(provider, model_name):
+    """Check if a model should be skipped during selection"""
+    return provider == 'deepseek' and model_name == 'deepseek-r1'
+
+def _create_model_entry(provider, model_name):
+    """Create a standardized model entry"""
+    return {
+        'provider': provider,
+        'model': model_name,
+        'display_name': f"{provider.title()} {model_name.replace('-', ' ').title()}"
+    }
+
+def _add_deepseek_v3_alternative(selected_models):
+    """Add deepseek-v3 if no deepseek models are selected"""
+    if any(m['provider'] == 'deepseek' for m in selected_models):
+        return selected_models
+
+    try:
+        log_message('INFO', '🔍 Checking for deepseek-v3 alternative...')
+        all_models = px.models.list_models()
+        deepseek_v3 = next((m for m in all_models if m.provider == 'deepseek' and m.model == 'deepseek-v3'), None)
+        if deepseek_v3:
+            selected_models.append(_create_model_entry('deepseek', 'deepseek-v3'))
+            log_message('SUCCESS', '✅ Added deepseek-v3 as alternative')
+        else:
+            log_message('WARNING', '⚠️  No deepseek-v3 alternative found')
+    except Exception as e:
+        log_message('WARNING', f'⚠️  Could not check for deepseek-v3: {str(e)}')
+
+    return selected_models
+
+def get_largest_models():
+    """Get the largest models from each provider, excluding deepseek-r1"""
+    log_message('INFO', '🔍 Loading available AI models...')
+
+    try:
+        largest_models = px.models.list_models(model_size='largest')
+        log_message('SUCCESS', f'✅ Retrieved {len(largest_models)} models from ProxAI')
+
+        selected_models = []
+        filtered_count = 0
+
+        for model in largest_models:
+            provider = model.provider
+            model_name = model.model
+
+            if _should_skip_model(provider, model_name):
+                filtered_count += 1
+                log_message('INFO', f'⚠️  Skipping {provider}/{model_name} (filtered out)')
+                continue
+
+            selected_models.append(_create_model_entry(provider, model_name))
+            log_message('INFO', f'✅ Added model: {provider}/{model_name}')
+
+        selected_models = _add_deepseek_v3_alternative(selected_models)
+
+        log_message('SUCCESS', f'🎯 Model selection complete!', {
+            'Total available': len(largest_models),
+            'Filtered out': filtered_count,
+            'Final selection': len(selected_models)
+        })
+
+        return selected_models
+
+    except Exception as e:
+        log_message('ERROR', f'❌ Failed to load models: {str(e)}')
+        return []
+
+def _model_name(model):
+    """Get the provider/model identifier for a model entry"""
+    return f"{model['provider']}/{model['model']}"
+
+class ModelStatsStore:
+    """Rolling per-model latency and error statistics with a circuit breaker
+
+    Each model keeps an EWMA of successful latencies, a window of recent
+    latencies for percentiles, and a window of recent outcomes for its error
+    rate. A model's circuit opens after too many consecutive failures or a
+    high windowed error rate; open models are skipped until the cooldown
+    passes, then a single trial query decides whether the circuit closes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}  # model name -> stats
+
+    def _get(self, model_name):
+        stats = self._models.get(model_name)
+        if stats is None:
+            stats = {
+                'ewma_latency': None,
+                'latencies': collections.deque(maxlen=200),
+                'outcomes': collections.deque(maxlen=MODEL_STATS_WINDOW),
+                'consecutive_failures': 0,
+                'requests': 0,
+                'failures': 0,
+                'circuit': 'closed',  # 'closed', 'open', 'half_open'
+                'opened_at': None,
+                'trial_in_flight': False
+            }
+            self._models[model_name] = stats
+        return stats
+
+    def record(self, model_name, success, time_taken):
+        """Record the outcome of a query that actually reached the provider"""
+        with self._lock:
+            stats = self._get(model_name)
+            stats['requests'] += 1
+            stats['outcomes'].append(success)
+            stats['trial_in_flight'] = False
+
+            if success:
+                stats['latencies'].append(time_taken)
+                previous = stats['ewma_latency']
+                stats['ewma_latency'] = time_taken if previous is None else (
+                    MODEL_STATS_EWMA_ALPHA * time_taken + (1 - MODEL_STATS_EWMA_ALPHA) * previous)
+                stats['consecutive_failures'] = 0
+                if stats['circuit'] != 'closed':
+                    stats['circuit'] = 'closed'
+                    log_message('SUCCESS', f'🔌 Circuit closed for {model_name}')
+                return
+
+            stats['failures'] += 1
+            stats['consecutive_failures'] += 1
+            error_rate = stats['outcomes'].count(False) / len(stats['outcomes'])
+            should_open = (
+                stats['circuit'] == 'half_open'
+                or stats['consecutive_failures'] >= CIRCUIT_FAILURE_THRESHOLD
+                or (len(stats['outcomes']) >= CIRCUIT_MIN_REQUESTS and error_rate >= CIRCUIT_ERROR_RATE)
+            )
+            if should_open:
+                if stats['circuit'] != 'open':
+                    log_message('WARNING', f'🚧 Circuit opened for {model_name}', {
+                        'Consecutive failures': stats['consecutive_failures'],
+                        'Error rate': f'{error_rate * 100:.0f}%'
+                    })
+                stats['circuit'] = 'open'
+                stats['opened_at'] = time.time()
+
+    def release_trial(self, model_name):
+        """Let a half-open circuit admit another trial after one ended without a recorded outcome"""
+        with self._lock:
+            stats = self._models.get(model_name)
+            if stats is not None:
+                stats['trial_in_flight'] = False
+
+    def allow_request(self, model_name):
+        """Check whether a model may be queried, admitting one trial after the cooldown
+
+        Returns (allowed, trial). Only the caller granted the trial may hand
+        it back with release_trial.
+        """
+        with self._lock:
+            stats = self._get(model_name)
+            if stats['circuit'] == 'closed':
+                return True, False
+            if stats['circuit'] == 'open' and time.time() - stats['opened_at'] >= CIRCUIT_COOLDOWN:
+                stats['circuit'] = 'half_open'
+            if stats['circuit'] == 'half_open' and not stats['trial_in_flight']:
+                stats['trial_in_flight'] = True
+                return True, True
+            return False, False
+
+    def circuit_closed(self, model_name):
+        """Check whether a model's circuit is closed, without admitting a trial"""
+        with self._lock:
+            stats = self._models.get(model_name)
+            return stats is None or stats['circuit'] == 'closed'
+
+    def expected_latency(self, model_name):
+        """Get a model's EWMA latency, 0 for models without history"""
+        with self._lock:
+            stats = self._models.get(model_name)
+            return (stats['ewma_latency'] or 0) if stats else 0
+
+    def percentile(self, model_name, fraction, min_samples=1):
+        """Get a latency percentile, or None until enough samples exist"""
+        with self._lock:
+            stats = self._models.get(model_name)
+            samples = sorted(stats['latencies']) if stats else []
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[int(fraction * (len(samples) - 1))]
+
+    def snapshot(self):
+        """Get every model's statistics for the stats endpoint"""
+        with self._lock:
+            names = list(self._models)
+        snapshot = {}
+        for model_name in sorted(names):
+            with self._lock:
+                stats = self._models[model_name]
+                outcomes = list(stats['outcomes'])
+                entry = {
+                    'requests': stats['requests'],
+                    'failures': stats['failures'],
+                    'error_rate': round(outcomes.count(False) / len(outcomes), 4) if outcomes else 0.0,
+                    'ewma_latency': round(stats['ewma_latency'], 3) if stats['ewma_latency'] is not None else None,
+                    'circuit': stats['circuit']
+                }
+            entry['p50_latency'] = self.percentile(model_name, 0.5)
+            entry['p95_latency'] = self.percentile(model_name, 0.95)
+            snapshot[model_name] = entry
+        return snapshot
+
+model_stats = ModelStatsStore()
+
+def _collect_runtime_metrics():
+    """Read gauges and counters from the live schedulers and stores at scrape time"""
+    jobs = job_scheduler.snapshot()
+    yield 'chat_jobs', {'state': 'queued'}, jobs['queued']
+    yield 'chat_jobs', {'state': 'running'}, jobs['running']
+    for provider, counts in model_query_scheduler.snapshot().items():
+        yield 'chat_model_queries', {'provider': provider, 'state': 'queued'}, counts['queued']
+        yield 'chat_model_queries', {'provider': provider, 'state': 'running'}, counts['running']
+
+    cache = response_cache.stats()
+    yield 'chat_response_cache_lookups_total', {'result': 'memory_hit'}, cache['hits'] - cache['disk_hits']
+    yield 'chat_response_cache_lookups_total', {'result': 'disk_hit'}, cache['disk_hits']
+    yield 'chat_response_cache_lookups_total', {'result': 'miss'}, cache['misses']
+    yield 'chat_response_cache_coalesced_total', {}, generation_flights.coalesced
+
+    for model_name, stats in model_stats.snapshot().items():
+        yield 'chat_model_circuit_open', {'model': model_name}, int(stats['circuit'] != 'closed')
+
+    yield 'chat_event_streams', {}, event_streams.count()
+
+metrics.add_collector(_collect_runtime_metrics)
+
+def _create_completion_policy(policy=None):
+    """Merge a request's completion policy over the server defaults"""
+    policy = policy or {}
+    return {
+        'model_deadline': float(policy.get('model_deadline', MODEL_QUERY_DEADLINE)),
+        'quorum': int(policy.get('quorum', MODEL_QUERY_QUORUM)),
+        'hedge': bool(policy.get('hedge', MODEL_QUERY_HEDGE)),
+        'progressive': bool(policy.get('progressive', PROGRESSIVE_COMBINE)),
+        'progressive_first_batch': max(1, int(policy.get('progressive_first_batch', PROGRESSIVE_FIRST_BATCH)))
+    }
+
+def _completion_policy_error(policy, model_count):
+    """Check a request's completion policy, returning an error message or None"""
+    unknown = set(policy) - {'model_deadline', 'quorum', 'hedge', 'progressive', 'progressive_first_batch'}
+    if unknown:
+        return f'Unknown completion policy field: {sorted(unknown)[0]}'
+    for field in ('hedge', 'progressive'):
+        if field in policy and not isinstance(policy[field], bool):
+            return f'Completion policy {field} must be true or false'
+    # bool is an int subclass, so true/false are not counts or seconds
+    for field, limit in (('quorum', model_count), ('progressive_first_batch', None)):
+        value = policy.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1
+                                  or (limit is not None and value > limit)):
+            bound = f' up to the {limit} selected models' if limit is not None else ''
+            return f'Completion policy {field} must be a positive integer{bound}'
+    deadline = policy.get('model_deadline')
+    if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float))
+                                 or not math.isfinite(deadline) or deadline <= 0):
+        return 'Completion policy model_deadline must be a positive number of seconds'
+    return None
+
+def _find_hedge_model(model, excluded_names):
+    """Pick an alternate model to hedge a slow one, preferring the same provider"""
+    # A hedge is meant to be faster, so degraded models are never picked
+    candidates = [m for m in available_models
+                  if _model_name(m) not in excluded_names and model_stats.circuit_closed(_model_name(m))]
+    same_provider = [m for m in candidates if m['provider'] == model['provider']]
+    if same_provider:
+        return same_provider[0]
+    return candidates[0] if candidates else None
+
+def load_model_catalog_snapshot():
+    """Load the last saved model catalog, or None if there is no usable snapshot"""
+    try:
+        with open(MODEL_CATALOG_PATH) as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log_message('WARNING', f'⚠️  Ignoring unreadable model catalog snapshot: {str(e)}')
+        return None
+
+    if not snapshot.get('models'):
+        return None
+    return snapshot
+
+def save_model_catalog_snapshot(models):
+    """Atomically write the model catalog snapshot"""
+    temp_path = f'{MODEL_CATALOG_PATH}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'saved_at': time.time(), 'models': models}, f)
+    os.replace(temp_path, MODEL_CATALOG_PATH)
+
+def refresh_model_catalog():
+    """Rediscover models and publish them, keeping the old catalog on failure"""
+    ensure_proxai_connection()
+    models = get_largest_models()
+    if not models:
+        log_message('WARNING', '⚠️  Model discovery returned nothing, keeping the current catalog')
+        return False
+
+    set_available_models(models)
+    try:
+        save_model_catalog_snapshot(models)
+    except OSError as e:
+        log_message('WARNING', f'⚠️  Could not save model catalog snapshot: {str(e)}')
+    return True
+
+def _refresh_model_catalog_loop(initial_delay):
+    """Refresh the model catalog on a fixed schedule"""
+    delay = initial_delay
+    while True:
+        time.sleep(delay)
+        try:
+            refresh_model_catalog()
+        except Exception as e:
+            log_message('ERROR', f'❌ Model catalog refresh failed: {str(e)}')
+        delay = MODEL_CATALOG_REFRESH_INTERVAL
+
+def _follow_model_catalog_loop():
+    """Reload the catalog snapshot whenever the discovering worker rewrites it"""
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.stat(MODEL_CATALOG_PATH).st_mtime
+        except OSError:
+            mtime = None
+        if mtime is not None and last_mtime is not None and mtime != last_mtime:
+            snapshot = load_model_catalog_snapshot()
+            if snapshot:
+                set_available_models(snapshot['models'])
+                log_message('INFO', f'🔄 Reloaded {len(available_models)} models from catalog snapshot')
+        last_mtime = mtime
+        time.sleep(min(60, MODEL_CATALOG_REFRESH_INTERVAL))
+
+def start_model_catalog_refresher(initial_delay):
+    """Start the background model catalog refresh thread"""
+    # Only the first worker process rediscovers; the others follow its snapshot
+    follow = WORKER_INDEX not in (None, '0')
+    thread = threading.Thread(
+        target=_follow_model_catalog_loop if follow else _refresh_model_catalog_loop,
+        args=() if follow else (initial_delay,),
+        name='model-catalog',
+        daemon=True
+    )
+    thread.start()
+
+def _create_success_result(model, response, time_taken):
+    """Create a successful query result"""
+    return {
+        'model': model,
+        'response': response,
+        'time_taken': time_taken,
+        'success': True
+    }
+
+def _create_error_result(model, error, time_taken):
+    """Create a failed query result"""
+    return {
+        'model': model,
+        'response': None,
+        'time_taken': time_taken,
+        'success': False,
+        'error': str(error)
+    }
+
+def _generate_text_with_delta(on_delta, **generate_kwargs):
+    """Generate text and forward it to on_delta as soon as the response is complete
+
+    ProxAI only returns whole responses, so each generation produces a single
+    delta; subscribers still see each model's answer the moment it exists
+    instead of after the whole fan-out.
+    """
+    response = px.generate_text(**generate_kwargs)
+    if on_delta is not None:
+        on_delta(response)
+    return response
+
+def response_cache_key(**generate_kwargs):
+    """Hash the inputs that determine a generated response"""
+    payload = json.dumps(
+        [list(generate_kwargs['provider_model']), generate_kwargs['system'], generate_kwargs['messages'],
+         generate_kwargs['max_tokens'], generate_kwargs['temperature']],
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _generate_text_cached(on_delta, **generate_kwargs):
+    """Generate text through the response cache and in-flight coalescing
+
+    Returns (text, reused) where reused means the text came from the cache
+    or from an identical call that was already running.
+    """
+    cache_key = response_cache_key(**generate_kwargs)
+    if response_cache.enabled:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            if on_delta is not None:
+                on_delta(cached)
+            return cached, True
+
+    def generate(publish_delta):
+        start_time = time.time()
+        response = _generate_text_with_delta(publish_delta, **generate_kwargs)
+        if response_cache.enabled:
+            response_cache.put(cache_key, response, time.time() - start_time)
+        return response
+
+    return generation_flights.do(cache_key, generate, on_delta)
+
+GENERATION_LATENCY_METRICS = {'model': 'chat_model_query_seconds', 'combiner': 'chat_combiner_seconds'}
+
+def _record_generation_metrics(stage, model_name, elapsed, outcome, messages, response=None):
+    """Record latency and prompt/response sizes for one generation"""
+    metrics.observe(GENERATION_LATENCY_METRICS[stage], elapsed, model=model_name, outcome=outcome)
+    metrics.observe('chat_prompt_chars', sum(len(m['content']) for m in messages), stage=stage)
+    if response is not None:
+        metrics.observe('chat_response_chars', len(response), stage=stage)
+
+def query_single_model(model, user_message, chat_history, on_delta=None, trial=False):
+    """Query a single model and return result with timing
+
+    trial marks the query a half-open circuit admitted as its trial.
+    """
+    model_name = f"{model['provider']}/{model['model']}"
+    try:
+        # Reuse this worker thread's ProxAI connection
+        ensure_proxai_connection()
+        return _query_model(model, model_name, chat_history, on_delta)
+    finally:
+        # Reused answers and coalesced failures record no outcome, so the
+        # trial must be released here
+        if trial:
+            model_stats.release_trial(model_name)
+
+def _query_model(model, model_name, chat_history, on_delta):
+    """Generate one model's answer, recording its outcome and timing"""
+    log_message('INFO', f'🚀 Querying {model_name}...')
+
+    start_time = time.time()
+    try:
+        with trace_span('generate', prompt_chars=sum(len(m['content']) for m in chat_history)):
+            response, reused = _generate_text_cached(
+                on_delta,
+                system="You are a helpful AI assistant. Be conversational and engaging.",
+                messages=chat_history,
+                provider_model=(model['provider'], model['model']),
+                max_tokens=500,
+                temperature=0.7
+            )
+
+        elapsed = time.time() - start_time
+        time_taken = round(elapsed, 2)
+        # Reused responses say nothing about the provider's latency
+        if not reused:
+            model_stats.record(model_name, True, time_taken)
+        _record_generation_metrics('model', model_name, elapsed,
+                                   'reused' if reused else 'success', chat_history, response)
+        annotate_span(outcome='reused' if reused else 'success', response_chars=len(response))
+
+        log_message('SUCCESS', f'✅ {model_name} responded successfully', {
+            'Response time': f'{time_taken}s',
+            'Reused': reused,
+            'Response length': f'{len(response)} chars'
+        })
+
+        return _create_success_result(model, response, time_taken)
+
+    except Exception as e:
+        elapsed = time.time() - start_time
+        time_taken = round(elapsed, 2)
+        # A failure shared by coalesced callers counts once, for the caller that ran it
+        coalesced = isinstance(e, CoalescedCallError)
+        if not coalesced:
+            check_proxai_connection_error(e)
+            model_stats.record(model_name, False, time_taken)
+        _record_generation_metrics('model', model_name, elapsed, 'error', chat_history)
+        annotate_span(outcome='error', error=str(e), coalesced=coalesced)
+
+        log_message('ERROR', f'❌ {model_name} failed to respond', {
+            'Error': str(e),
+            'Time elapsed': f'{time_taken}s'
+        })
+
+        return _create_error_result(model, e, time_taken)
+
+def _model_delta_publisher(job_id, model):
+    """Build a callback that streams a model's partial output to the job"""
+    if job_id is None:
+        return None
+
+    model_name = f"{model['provider']}/{model['model']}"
+
+    def publish_delta(text):
+        publish_job_event(job_id, 'model_delta', {
+            'model_name': model_name,
+            'display_name': model['display_name'],
+            'text': text
+        })
+
+    return publish_delta
+
+def _record_model_result(job_id, result, completed_count, total_models):
+    """Report a model's final result to the job's progress and event stream"""
+    model_name = _model_name(result['model'])
+    completed_response = {
+        'model_name': model_name,
+        'success': result['success'],
+        'display_name': result['model']['display_name']
+    }
+
+    # Update progress
+    counters = record_model_completion(job_id, completed_response)
+    if counters:
+        publish_job_event(job_id, 'model_completed', {
+            **completed_response,
+            **counters,
+            'time_taken': result['time_taken']
+        })
+
+    status = "✅" if result['success'] else "❌"
+    log_message('INFO', f'{status} {completed_count}/{total_models} models completed: {model_name}')
+
+def query_all_models_parallel(available_models, user_message, chat_history, job_id=None,
+                              completion_policy=None, model_histories=None, on_result=None,
+                              cancel_event=None):
+    """Query all models in parallel and return results
+
+    Each selected model is a slot. A slot resolves with the first successful
+    result from the model or its hedge, with its last error once every attempt
+    failed, or with a deadline error. The fan-out returns as soon as the
+    quorum of successes is reached; queries still running are left to finish
+    and attached to the job as late results.
+
+    model_histories optionally maps a model name to the history window it
+    should receive instead of chat_history. on_result is called with each
+    slot's result as soon as it resolves. Once cancel_event is set the
+    fan-out stops waiting, drops queries that have not started yet and
+    returns the results resolved so far.
+
+    Results come back in the order the models were selected, whatever order
+    they completed in, so identical requests build identical combiner prompts.
+    """
+    policy = _create_completion_policy(completion_policy)
+    total_models = len(available_models)
+    quorum = min(policy['quorum'], total_models) if policy['quorum'] > 0 else total_models
+    deadline = policy['model_deadline']
+
+    log_message('INFO', f'🌟 Starting parallel query of {total_models} models...', {
+        'Quorum': f'{quorum}/{total_models}',
+        'Deadline': f'{deadline}s' if deadline else 'none',
+        'Hedging': policy['hedge']
+    })
+
+    # Initialize progress tracking
+    update_job_progress(
+        job_id,
+        is_processing=True,
+        total_models=total_models,
+        completed_models=0,
+        successful_models=0,
+        failed_models=0,
+        current_stage='querying',
+        start_time=time.time(),
+        completed_responses=[]
+    )
+    publish_job_event(job_id, 'stage', {
+        'stage': 'querying',
+        'total_models': total_models
+    })
+
+    start_time = time.time()
+    slots = {}  # model name -> {'model', 'futures', 'started_at', 'hedged'}
+    future_to_slot = {}
+    used_model_names = {_model_name(m) for m in available_models}
+
+    model_histories = model_histories or {}
+
+    def submit(slot_name, model, trial=False):
+        # The span's 'waiting' child is the time spent queued for a provider slot
+        run_query = traced(query_single_model, 'model', model=_model_name(model), slot=slot_name)
+        future = model_query_scheduler.submit(
+            model['provider'],
+            run_query, model, user_message, model_histories.get(slot_name, chat_history),
+            on_delta=_model_delta_publisher(job_id, model), trial=trial
+        )
+        def on_dropped(f):
+            if not f.cancelled():
+                return
+            # A trial dropped before it started never ran
+            if trial:
+                model_stats.release_trial(_model_name(model))
+            if hasattr(run_query, 'abandon'):
+                run_query.abandon(outcome='dropped')
+
+        future.add_done_callback(on_dropped)
+        future_to_slot[future] = slot_name
+        slots[slot_name]['futures'].append(future)
+        return future
+
+    # Skip models with an open circuit; historically fast models go first
+    # so they win the per-provider slots
+    allowed_models = []
+    trial_names = set()  # models whose half-open circuit admitted this fan-out as the trial
+    for model in available_models:
+        allowed, trial = model_stats.allow_request(_model_name(model))
+        if allowed:
+            allowed_models.append(model)
+        if trial:
+            trial_names.add(_model_name(model))
+    if not allowed_models:
+        log_message('WARNING', '🚧 Every selected model is degraded, querying them anyway')
+        allowed_models = list(available_models)
+    allowed_models.sort(key=lambda m: model_stats.expected_latency(_model_name(m)))
+    skipped_models = [m for m in available_models if m not in allowed_models]
+
+    # Submit all tasks to the shared scheduler
+    for model in allowed_models:
+        slot_name = _model_name(model)
+        slots[slot_name] = {'model': model, 'futures': [], 'started_at': time.time(), 'hedged': False}
+        submit(slot_name, model, trial=slot_name in trial_names)
+
+    log_message('INFO', f'📤 Submitted {len(future_to_slot)} parallel requests', {
+        'Skipped (circuit open)': [_model_name(m) for m in skipped_models] or 'none'
+    })
+
+    # Collect results as they complete
+    results = {}  # slot name -> resolved result, in completion order
+    successful_count = 0
+    pending = set(future_to_slot)
+    slot_order = {_model_name(m): index for index, m in enumerate(available_models)}
+
+    def ordered_results():
+        return [results[slot_name] for slot_name in sorted(results, key=slot_order.get)]
+
+    def resolve(slot_name, result):
+        nonlocal successful_count
+        results[slot_name] = result
+        if result['success']:
+            successful_count += 1
+        _record_model_result(job_id, result, len(results), total_models)
+        if on_result is not None:
+            on_result(result)
+
+    for model in skipped_models:
+        resolve(_model_name(model), _create_error_result(model, 'Skipped: model is degraded (circuit open)', 0))
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    while pending and successful_count < quorum and not cancelled():
+        # Wake up for the next deadline or hedge trigger among unresolved slots
+        wake_times = []
+        for slot_name, slot in slots.items():
+            if slot_name in results:
+                continue
+            if deadline:
+                wake_times.append(slot['started_at'] + deadline)
+            if policy['hedge'] and not slot['hedged']:
+                p95 = model_stats.percentile(slot_name, 0.95, HEDGE_MIN_SAMPLES)
+                if p95 is not None:
+                    wake_times.append(slot['started_at'] + p95)
+        timeout = max(0, min(wake_times) - time.time()) if wake_times else None
+        if cancel_event is not None:
+            # Wake up regularly to notice a cancellation
+            timeout = CANCEL_CHECK_INTERVAL if timeout is None else min(timeout, CANCEL_CHECK_INTERVAL)
+
+        done, pending = concurrent.futures.wait(
+            pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+
+        for future in done:
+            slot_name = future_to_slot[future]
+            if slot_name in results:
+                continue
+            result = future.result()
+            # A failed attempt only settles the slot once its hedge has failed too
+            if result['success'] or all(f.done() for f in slots[slot_name]['futures']):
+                if result['model'] is not slots[slot_name]['model']:
+                    result['hedged_for'] = slot_name
+                resolve(slot_name, result)
+
+        now = time.time()
+        for slot_name, slot in slots.items():
+            if slot_name in results:
+                continue
+            elapsed = now - slot['started_at']
+            if deadline and elapsed >= deadline:
+                log_message('WARNING', f'⏰ {slot_name} missed its {deadline}s deadline')
+                resolve(slot_name, _create_error_result(
+                    slot['model'], f'Deadline of {deadline}s exceeded', round(elapsed, 2)))
+            elif policy['hedge'] and not slot['hedged']:
+                p95 = model_stats.percentile(slot_name, 0.95, HEDGE_MIN_SAMPLES)
+                if p95 is None or elapsed < p95:
+                    continue
+                slot['hedged'] = True
+                hedge_model = _find_hedge_model(slot['model'], used_model_names)
+                if hedge_model:
+                    used_model_names.add(_model_name(hedge_model))
+                    log_message('WARNING', f'🪁 {slot_name} passed its p95 of {p95}s, hedging with {_model_name(hedge_model)}')
+                    pending.add(submit(slot_name, hedge_model))
+
+        # Stop waiting on attempts for slots that are already settled
+        pending = {f for f in pending if future_to_slot[f] not in results}
+
+    if cancelled():
+        # Queries still waiting for a provider slot never start; running ones are discarded
+        dropped = sum(future.cancel() for future in future_to_slot)
+        log_message('WARNING', '🛑 Parallel query cancelled', {
+            'Resolved': len(results),
+            'Dropped before starting': dropped,
+            'Discarded while running': sum(not future.done() for future in future_to_slot)
+        })
+        return ordered_results()
+
+    # Whatever is still running becomes a late result on the job
+    late_count = 0
+    for slot_name, slot in slots.items():
+        if slot_name in results and results[slot_name]['success']:
+            continue
+        for future in slot['futures']:
+            if not future.done():
+                late_count += 1
+                if job_id is not None:
+                    expect_late_result(job_id, future)
+
+    results = ordered_results()
+    total_time = round(time.time() - start_time, 2)
+    failed_count = len(results) - successful_count
+
+    log_message('SUCCESS', f'🏁 Parallel query completed!', {
+        'Total time': f'{total_time}s',
+        'Successful': successful_count,
+        'Failed': failed_count,
+        'Still running': late_count,
+        'Success rate': f'{(successful_count/max(len(results), 1)*100):.1f}%'
+    })
+
+    return results
+
+# Pre-serialized responses: url path -> asset built by _build_asset
+static_assets = {}
+static_assets_lock = threading.Lock()
+
+# Text assets compressed in memory; binary files are streamed with sendfile
+STATIC_FILES = {
+    '/': ('index.html', 'text/html; charset=utf-8', 'no-cache'),
+    '/style.css': ('style.css', 'text/css; charset=utf-8', f'public, max-age={STATIC_MAX_AGE}'),
+}
+SENDFILE_FILES = {
+    '/use_case.gif': ('use_case.gif', 'image/gif', f'public, max-age={STATIC_MAX_AGE}'),
+}
+KNOWN_ROUTES = {'/', '/style.css', '/models', '/progress', '/models/stats', '/cache/stats', '/metrics', '/chat',
+                '/chat/batch', *SENDFILE_FILES}
+
+def _build_asset(body, content_type, cache_control):
+    """Pre-serialize a response body with its compressed variants and ETag"""
+    encodings = {'gzip': gzip.compress(body, compresslevel=9)}
+    if brotli is not None:
+        encodings['br'] = brotli.compress(body)
+
+    # Only keep encodings that actually save bytes
+    encodings = {name: data for name, data in encodings.items() if len(data) < len(body)}
+    digest = hashlib.sha256(body).hexdigest()[:32]
+
+    return {
+        'body': body,
+        'encodings': encodings,
+        # Strong ETags must differ per encoded representation
+        'etags': {None: f'"{digest}"', **{name: f'"{digest}-{name}"' for name in encodings}},
+        'content_type': content_type,
+        'cache_control': cache_control
+    }
+
+def load_static_assets():
+    """Read and compress the static files once"""
+    for path, (file_name, content_type, cache_control) in STATIC_FILES.items():
+        with open(os.path.join(STATIC_DIR, file_name), 'rb') as f:
+            asset = _build_asset(f.read(), content_type, cache_control)
+        with static_assets_lock:
+            static_assets[path] = asset
+
+def set_available_models(models):
+    """Replace the model catalog and its pre-serialized /models response"""
+    global available_models
+    available_models = models
+    body = json.dumps({'models': models}).encode()
+    asset = _build_asset(body, 'application/json', 'no-cache')
+    with static_assets_lock:
+        static_assets['/models'] = asset
+
+def _etag_matches(handler, etag):
+    """Check a conditional request against an ETag"""
+    if_none_match = handler.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+def _send_not_modified(handler, etag, cache_control, vary=True):
+    """Send a 304 for a cached asset"""
+    handler.send_response(304)
+    handler.send_header('ETag', etag)
+    handler.send_header('Cache-Control', cache_control)
+    if vary:
+        handler.send_header('Vary', 'Accept-Encoding')
+    handler.send_header('Content-Length', '0')
+    handler.end_headers()
+
+def _accepted_encodings(accept_encoding):
+    """Parse an Accept-Encoding header into {coding: q-value}"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+def _choose_encoding(accept_encoding, available):
+    """Pick the acceptable encoding with the highest q-value, preferring br on ties"""
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for name in ('br', 'gzip'):
+        q = accepted.get(name, wildcard)
+        if name in available and q > best_q:
+            best, best_q = name, q
+    return best
+
+def _serve_asset(handler, path):
+    """Serve a pre-serialized asset with compression and ETag revalidation"""
+    with static_assets_lock:
+        asset = static_assets.get(path)
+    if asset is None:
+        if path not in STATIC_FILES:
+            _serve_404(handler)
+            return
+        load_static_assets()
+        with static_assets_lock:
+            asset = static_assets[path]
+
+    encoding = _choose_encoding(handler.headers.get('Accept-Encoding', ''), asset['encodings'])
+    body = asset['encodings'][encoding] if encoding else asset['body']
+    etag = asset['etags'][encoding]
+
+    if _etag_matches(handler, etag):
+        _send_not_modified(handler, etag, asset['cache_control'])
+        return
+
+    handler.send_response(200)
+    handler.send_header('Content-type', asset['content_type'])
+    handler.send_header('Content-Length', str(len(body)))
+    handler.send_header('ETag', etag)
+    handler.send_header('Cache-Control', asset['cache_control'])
+    handler.send_header('Vary', 'Accept-Encoding')
+    if encoding:
+        handler.send_header('Content-Encoding', encoding)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+def _serve_file(handler, path, log_emoji, log_description):
+    """Serve a static file with proper headers"""
+    client_ip = handler.client_address[0]
+    log_message('INFO', f'{log_emoji} {log_description} to {client_ip}', sampled=True)
+    _serve_asset(handler, path)
+
+def _serve_sendfile(handler, path):
+    """Serve a binary file straight from disk with zero-copy sendfile"""
+    file_name, content_type, cache_control = SENDFILE_FILES[path]
+    file_path = os.path.join(STATIC_DIR, file_name)
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        _serve_404(handler)
+        return
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    if _etag_matches(handler, etag):
+        _send_not_modified(handler, etag, cache_control, vary=False)
+        return
+
+    with open(file_path, 'rb') as f:
+        handler.send_response(200)
+        handler.send_header('Content-type', content_type)
+        handler.send_header('Content-Length', str(stat.st_size))
+        handler.send_header('ETag', etag)
+        handler.send_header('Cache-Control', cache_control)
+        handler.end_headers()
+        handler.connection.sendfile(f)
+
+def _serve_models_json(handler):
+    """Serve the models list as JSON"""
+    client_ip = handler.client_address[0]
+    log_message('INFO', f'📋 Serving models list to {client_ip}', {
+        'Available models': len(available_models)
+    }, sampled=True)
+    with static_assets_lock:
+        has_models = '/models' in static_assets
+    if not has_models:
+        set_available_models(available_models)
+    _serve_asset(handler, '/models')
+
+def _serve_progress_json(handler, job_id=None):
+    """Serve a job's progress as JSON, defaulting to the most recent job"""
+    progress = get_job_progress(job_id or latest_job_id)
+
+    if progress is not None and progress['is_processing']:
+        touch_job(job_id or latest_job_id)
+
+    if progress is None:
+        if job_id:
+            _send_json_response(handler, {'error': 'Job not found'}, 404)
+            return
+        # No job has run yet
+        progress = _create_progress()
+        progress.pop('start_time')
+        progress['elapsed_time'] = 0
+
+    _send_json_response(handler, progress, 200)
+
+def _serve_job_status(handler, job_id):
+    """Serve job status as JSON"""
+    client_ip = handler.client_address[0]
+    job = get_job(job_id)
+
+    if not job:
+        _send_json_response(handler, {'error': 'Job not found'}, 404)
+        return
+
+    if job['status'] not in FINISHED_JOB_STATUSES:
+        touch_job(job_id)
+
+    # Create response without internal fields
+    response = {
+        'id': job['id'],
+        'status': job['status'],
+        'created_at': job['created_at']
+    }
+
+    if job['status'] == 'pending':
+        response['queue_position'] = job_queue_position(job_id)
+    elif job['status'] == 'processing' and job['progress'].get('provisional_result'):
+        response['provisional_result'] = job['progress']['provisional_result']
+
+    if job['progress'].get('reduction'):
+        response['reduction'] = job['progress']['reduction']
+
+    if job['late_results']:
+        response['late_results'] = list(job['late_results'])
+
+    if job['status'] == 'completed' and job['result']:
+        response['result'] = job['result']
+    elif job['status'] in ('error', 'cancelled') and job['error']:
+        response['error'] = job['error']
+
+    _send_json_response(handler, response, 200)
+
+def _serve_job_trace(handler, job_id, trace_format):
+    """Serve a job's span tree as JSON, or as a Chrome-trace file with format=chrome"""
+    job = get_job(job_id)
+    trace = job.get('trace') if job else None
+    if isinstance(trace, dict):
+        # Finished in another worker process or before a restart
+        trace = JobTrace.from_record(trace)
+    if trace is None:
+        # A job running in another worker has no stored trace until it finishes
+        error = 'Trace not available for this job' if job else 'Job not found'
+        _send_json_response(handler, {'error': error}, 404)
+        return
+
+    if trace_format == 'chrome':
+        _send_json_response(handler, trace.to_chrome(), 200, {
+            'Content-Disposition': f'attachment; filename="{job_id}.trace.json"'
+        })
+    else:
+        _send_json_response(handler, trace.to_dict(), 200)
+
+def _format_sse_event(event_id, event_type, data):
+    """Format a single Server-Sent Event frame"""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n".encode()
+
+def _stored_job_events(job, state):
+    """Derive stream events for a job held only in the job store
+
+    state carries what was already reported between polls. Returns the new
+    (event_type, data) pairs and whether the stream is over.
+    """
+    if job is None:
+        return [], True
+    if job['status'] in FINISHED_JOB_STATUSES:
+        if job['status'] == 'completed':
+            final_event = ('job_completed', {'result': job['result']})
+        elif job['status'] == 'cancelled':
+            final_event = ('job_cancelled', {'error': job['error']})
+        else:
+            final_event = ('job_failed', {'error': job['error']})
+        # Late results still arriving in the other process are left to GET /job/<id>
+        return [final_event] + [('model_late', late_result) for late_result in job['late_results']], True
+
+    progress = job['progress']
+    if job['status'] == 'pending':
+        stage = 'queued'
+        data = {'stage': 'queued', 'queue_position': job_queue_position(job['id'])}
+    else:
+        stage = progress['current_stage']
+        data = {'stage': stage, 'total_models': progress['total_models']}
+    events = [('stage', data)] if stage != state.get('stage') else []
+    state['stage'] = stage
+    reported_models = state.get('reported_models', 0)
+    for completed_response in progress['completed_responses'][reported_models:]:
+        events.append(('model_completed', completed_response))
+    state['reported_models'] = len(progress['completed_responses'])
+    return events, False
+
+class EventStreamHub:
+    """Writes every Server-Sent Event stream from one thread
+
+    Once its headers are sent, a stream's connection leaves the HTTP worker
+    pool. Whenever a job publishes, the hub thread formats the new events
+    into each subscriber's buffer and sends them without blocking, so a slow
+    client only grows its own buffer. Jobs running in another worker process
+    are polled from the job store every WORKER_POLL_INTERVAL. Idle streams
+    get keep-alive comments, and an open stream counts as watching its job.
+    """
+
+    def __init__(self, max_streams):
+        self.max_streams = max_streams
+        self._lock = threading.Lock()
+        self._streams = 0  # reserved or open streams
+        self._new = []  # subscribers waiting to be registered by the hub thread
+        self._notified = set()  # job ids with unsent events
+        self._job_streams = collections.Counter()  # job id -> open streams
+        self._thread = None
+
+    def count(self):
+        """Get the number of open event streams"""
+        with self._lock:
+            return self._streams
+
+    def reserve(self):
+        """Claim a stream slot, returning False once max_streams are open"""
+        with self._lock:
+            if self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            if self._thread is None:
+                self._selector = selectors.DefaultSelector()
+                self._wake_reader, self._wake_writer = socket.socketpair()
+                self._wake_reader.setblocking(False)
+                self._wake_writer.setblocking(False)
+                self._selector.register(self._wake_reader, selectors.EVENT_READ)
+                self._thread = threading.Thread(target=self._run, name='event-streams', daemon=True)
+                self._thread.start()
+            return True
+
+    def release(self):
+        """Give back a reserved slot whose stream never started"""
+        with self._lock:
+            self._streams -= 1
+
+    def add(self, handler, job_id, job, next_index):
+        """Take over a handler's connection and stream job_id's events to it"""
+        subscriber = {
+            'handler': handler,
+            'job_id': job_id,
+            'job': job if 'events_cond' in job else None,  # None: polled from the job store
+            'next_index': next_index,
+            'stored_state': {},
+            'buffer': bytearray(),
+            'last_write': time.monotonic(),
+            'last_poll': 0,
+            'finished': False
+        }
+        with self._lock:
+            self._new.append(subscriber)
+            self._job_streams[job_id] += 1
+            self._notified.add(job_id)
+        self._wake()
+
+    def notify(self, job_id):
+        """Wake the hub for a job's new events if anyone is streaming it"""
+        with self._lock:
+            if job_id not in self._job_streams:
+                return
+            self._notified.add(job_id)
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_writer.send(b'\0')
+        except BlockingIOError:
+            pass  # A wake-up is already pending
+
+    def _run(self):
+        subscribers = {}  # socket -> subscriber
+        last_touch = 0
+        while True:
+            for key, mask in self._selector.select(timeout=min(WORKER_POLL_INTERVAL, 1)):
+                if key.fileobj is self._wake_reader:
+                    try:
+                        self._wake_reader.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                subscriber = key.data
+                if mask & selectors.EVENT_READ and not self._client_open(key.fileobj):
+                    log_message('INFO', f"🔌 Event stream for job {subscriber['job_id']} closed by client")
+                    self._close(subscriber, subscribers)
+                    continue
+                if mask & selectors.EVENT_WRITE:
+                    self._flush(subscriber, subscribers)
+
+            with self._lock:
+                new, self._new = self._new, []
+                notified, self._notified = self._notified, set()
+            for subscriber in new:
+                sock = subscriber['handler'].connection
+                sock.setblocking(False)
+                subscribers[sock] = subscriber
+                self._selector.register(sock, selectors.EVENT_READ, subscriber)
+
+            now = time.monotonic()
+            for subscriber in list(subscribers.values()):
+                if subscriber['job'] is not None:
+                    if subscriber['job_id'] in notified:
+                        self._collect_live(subscriber)
+                elif now - subscriber['last_poll'] >= WORKER_POLL_INTERVAL:
+                    subscriber['last_poll'] = now
+                    self._collect_stored(subscriber)
+                if not subscriber['buffer'] and now - subscriber['last_write'] >= SSE_HEARTBEAT_INTERVAL:
+                    # Comment frame keeps proxies from timing out the idle stream
+                    subscriber['buffer'] += b': keep-alive\n\n'
+                if subscriber['buffer']:
+                    self._flush(subscriber, subscribers)
+                elif subscriber['finished']:
+                    self._close(subscriber, subscribers)
+
+            if now - last_touch >= 1:
+                last_touch = now
+                for job_id in {subscriber['job_id'] for subscriber in subscribers.values()}:
+                    touch_job(job_id)
+
+    def _client_open(self, sock):
+        # Clients never send on an event stream, so readable means closed
+        try:
+            return sock.recv(1024) != b''
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def _collect_live(self, subscriber):
+        job = subscriber['job']
+        with job['events_cond']:
+            pending_events = job['events'][subscriber['next_index']:]
+            subscriber['finished'] = job['events_closed'] and not job['late_pending']
+        for event_type, data in pending_events:
+            subscriber['buffer'] += _format_sse_event(subscriber['next_index'], event_type, data)
+            subscriber['next_index'] += 1
+
+    def _collect_stored(self, subscriber):
+        try:
+            job = get_job(subscriber['job_id'])
+        except sqlite3.Error as e:
+            log_message('WARNING', f"⚠️  Could not poll job {subscriber['job_id']} for its event stream: {str(e)}")
+            return
+        events, subscriber['finished'] = _stored_job_events(job, subscriber['stored_state'])
+        for event_type, data in events:
+            subscriber['buffer'] += _format_sse_event(subscriber['next_index'], event_type, data)
+            subscriber['next_index'] += 1
+
+    def _flush(self, subscriber, subscribers):
+        sock = subscriber['handler'].connection
+        try:
+            sent = sock.send(subscriber['buffer'])
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._close(subscriber, subscribers)
+            return
+        if sent:
+            del subscriber['buffer'][:sent]
+            subscriber['last_write'] = time.monotonic()
+        if len(subscriber['buffer']) > SSE_MAX_BUFFER:
+            # EventSource reconnects and resumes from the last event it received
+            log_message('WARNING', f"🐢 Dropping slow event stream for job {subscriber['job_id']}")
+            self._close(subscriber, subscribers)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber['buffer'] else 0)
+        self._selector.modify(sock, events, subscriber)
+        if not subscriber['buffer'] and subscriber['finished']:
+            self._close(subscriber, subscribers)
+
+    def _close(self, subscriber, subscribers):
+        handler = subscriber['handler']
+        sock = handler.connection
+        if subscribers.pop(sock, None) is None:
+            return
+        self._selector.unregister(sock)
+        with self._lock:
+            self._streams -= 1
+            self._job_streams[subscriber['job_id']] -= 1
+            if not self._job_streams[subscriber['job_id']]:
+                del self._job_streams[subscriber['job_id']]
+        sock.setblocking(True)
+        handler.detached = False
+        handler.close_connection = True
+        try:
+            handler.finish()
+        except OSError:
+            pass
+        handler.server.shutdown_request(sock)
+
+event_streams = EventStreamHub(SSE_MAX_STREAMS)
+
+def _serve_job_events(handler, job_id):
+    """Stream job progress and results as Server-Sent Events"""
+    client_ip = handler.client_address[0]
+    job = get_job(job_id)
+
+    if not job:
+        _send_json_response(handler, {'error': 'Job not found'}, 404)
+        return
+
+    if not event_streams.reserve():
+        # The page falls back to polling when the stream cannot be opened
+        log_message('WARNING', f'🚦 Event stream limit of {SSE_MAX_STREAMS} reached, {client_ip} must poll')
+        _send_json_response(handler, {
+            'error': 'Too many event streams, poll the job instead',
+            'poll': f'/job/{job_id}'
+        }, 503, {'Retry-After': '5'})
+        return
+
+    # Resume after the last event the client saw when EventSource reconnects
+    last_event_id = handler.headers.get('Last-Event-ID')
+    next_index = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+
+    log_message('INFO', f'📡 Streaming events for job {job_id} to {client_ip}')
+
+    # The stream has no Content-Length, so the connection cannot be reused afterwards
+    handler.close_connection = True
+    try:
+        handler.send_response(200)
+        handler.send_header('Content-type', 'text/event-stream')
+        handler.send_header('Cache-Control', 'no-cache')
+        handler.send_header('Connection', 'close')
+        handler.end_headers()
+    except OSError:
+        event_streams.release()
+        raise
+
+    # The hub thread writes the stream once this request's turn is over
+    handler.detached = True
+    handler.event_stream = (job_id, job, next_index)
+
+def _serve_metrics(handler):
+    """Serve counters and histograms in the Prometheus text format"""
+    body = metrics.render().encode()
+    handler.send_response(200)
+    handler.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+def _route_label(path):
+    """Map a request path to its route, collapsing job ids"""
+    path = urlparse(path).path
+    if path.startswith('/job/'):
+        for suffix in ('/events', '/progress', '/trace'):
+            if path.endswith(suffix):
+                return '/job/<id>' + suffix
+        return '/job/<id>'
+    if path in KNOWN_ROUTES:
+        return path
+    return 'other'
+
+def _close_if_body_unread(handler):
+    """Close the connection after a response that leaves the request body unread
+
+    Otherwise the body would be parsed as the next keep-alive request.
+    """
+    if handler.headers.get('Content-Length', '0') != '0' or 'Transfer-Encoding' in handler.headers:
+        handler.body_unread = True
+
+def _serve_404(handler):
+    """Serve 404 error response"""
+    client_ip = handler.client_address[0]
+    log_message('WARNING', f'❓ 404 request from {client_ip}: {handler.path}')
+    _close_if_body_unread(handler)
+    handler.send_response(404)
+    handler.send_header('Content-Length', '0')
+    handler.end_headers()
+
+class BoundedThreadingHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server that hands individual requests to a fixed-size worker pool
 
-    except Exception as e:
-        time_taken = round(time.time() - start_time, 2)
+    A worker serves one request per turn. Between requests, keep-alive
+    connections are parked in a selector watched by a single thread, which
+    hands a connection back to the pool once its next request arrives and
+    closes it after HTTP_KEEPALIVE_TIMEOUT of silence. Idle clients therefore
+    never hold a worker.
+    """
+    request_queue_size = HTTP_LISTEN_BACKLOG
 
-        log_message('ERROR', f'❌ {model_name} failed to respond', {
-            'Error': str(e),
-            'Time elapsed': f'{time_taken}s'
-        })
+    def __init__(self, server_address, handler_class, max_workers=HTTP_MAX_WORKERS, reuse_port=False):
+        self.reuse_port = reuse_port
+        super().__init__(server_address, handler_class)
+        self.max_workers = max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='http-worker'
+        )
+        self._selector = selectors.DefaultSelector()
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self._selector.register(self._wake_reader, selectors.EVENT_READ)
+        self._parking_lock = threading.Lock()
+        self._to_park = []  # handlers waiting to be registered by the selector thread
+        self._closing = False
+        threading.Thread(target=self._watch_idle_connections, name='http-keepalive', daemon=True).start()
 
-        return _create_error_result(model, e, time_taken)
+    def server_bind(self):
+        if self.reuse_port:
+            # Worker processes bind the same port and the kernel spreads connections across them
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
 
-def query_all_models_parallel(available_models, user_message, chat_history):
-    """Query all models in parallel and return results"""
-    global current_progress
+    def process_request(self, request, client_address):
+        # Queue the first request instead of spawning an unbounded thread per client
+        self._executor.submit(self._first_turn, request, client_address)
 
-    log_message('INFO', f'🌟 Starting parallel query of {len(available_models)} models...')
+    def parked_connections(self):
+        """Get the number of idle keep-alive connections waiting for their next request"""
+        return len(self._selector.get_map()) - 1
 
-    # Initialize progress tracking
-    current_progress.update({
-        'is_processing': True,
-        'total_models': len(available_models),
-        'completed_models': 0,
-        'successful_models': 0,
-        'failed_models': 0,
-        'current_stage': 'querying',
-        'start_time': time.time(),
-        'completed_responses': []
-    })
+    def _first_turn(self, request, client_address):
+        try:
+            # BaseRequestHandler serves the first request from its constructor
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            return
+        self._after_turn(handler)
 
-    results = []
-    start_time = time.time()
+    def _next_turn(self, handler):
+        try:
+            handler.handle()
+        except Exception:
+            self.handle_error(handler.request, handler.client_address)
+            handler.close_connection = True
+        finally:
+            handler.finish()
+        self._after_turn(handler)
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=len(available_models)) as executor:
-        # Submit all tasks
-        future_to_model = {
-            executor.submit(query_single_model, model, user_message, chat_history): model
-            for model in available_models
-        }
+    def _after_turn(self, handler):
+        if handler.detached:
+            # The connection now belongs to the event stream hub
+            return
+        if handler.close_connection:
+            self.shutdown_request(handler.request)
+            return
 
-        log_message('INFO', f'📤 Submitted {len(future_to_model)} parallel requests')
+        # A pipelined request may already be buffered, and the selector would never see it
+        handler.connection.settimeout(0)
+        try:
+            buffered = handler.rfile.peek(1)
+        except OSError:
+            buffered = b''
+        finally:
+            handler.connection.settimeout(handler.timeout)
+        if buffered:
+            self._executor.submit(self._next_turn, handler)
+            return
 
-        # Collect results as they complete
-        completed_count = 0
-        for future in concurrent.futures.as_completed(future_to_model):
-            result = future.result()
-            results.append(result)
-            completed_count += 1
+        handler.parked_at = time.monotonic()
+        with self._parking_lock:
+            self._to_park.append(handler)
+        self._wake()
 
-            # Update progress
-            current_progress['completed_models'] = completed_count
-            if result['success']:
-                current_progress['successful_models'] += 1
-            else:
-                current_progress['failed_models'] += 1
+    def _wake(self):
+        try:
+            self._wake_writer.send(b'\0')
+        except BlockingIOError:
+            pass  # A wake-up is already pending
 
-            current_progress['completed_responses'].append({
-                'model_name': f"{result['model']['provider']}/{result['model']['model']}",
-                'success': result['success'],
-                'display_name': result['model']['display_name']
-            })
+    def _close_parked(self, handler):
+        self._selector.unregister(handler.connection)
+        handler.close_connection = True
+        handler.finish()
+        self.shutdown_request(handler.request)
 
-            model_name = f"{result['model']['provider']}/{result['model']['model']}"
-            status = "✅" if result['success'] else "❌"
-            log_message('INFO', f'{status} {completed_count}/{len(available_models)} models completed: {model_name}')
+    def _watch_idle_connections(self):
+        """Hand parked connections back to the pool when readable and close them when idle too long"""
+        while not self._closing:
+            for key, _ in self._selector.select(timeout=1):
+                if key.fileobj is self._wake_reader:
+                    try:
+                        self._wake_reader.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._selector.unregister(key.fileobj)
+                try:
+                    self._executor.submit(self._next_turn, key.data)
+                except RuntimeError:
+                    # The pool shut down with the server
+                    key.data.close_connection = True
+                    key.data.finish()
+                    self.shutdown_request(key.data.request)
 
-    total_time = round(time.time() - start_time, 2)
-    successful_count = sum(1 for r in results if r['success'])
-    failed_count = len(results) - successful_count
+            with self._parking_lock:
+                to_park, self._to_park = self._to_park, []
+            for handler in to_park:
+                self._selector.register(handler.connection, selectors.EVENT_READ, handler)
 
-    log_message('SUCCESS', f'🏁 Parallel query completed!', {
-        'Total time': f'{total_time}s',
-        'Successful': successful_count,
-        'Failed': failed_count,
-        'Success rate': f'{(successful_count/len(results)*100):.1f}%'
-    })
+            now = time.monotonic()
+            for key in list(self._selector.get_map().values()):
+                handler = key.data
+                if handler is not None and now - handler.parked_at >= HTTP_KEEPALIVE_TIMEOUT:
+                    self._close_parked(handler)
 
-    return results
+        for key in list(self._selector.get_map().values()):
+            if key.data is not None:
+                self._close_parked(key.data)
+        self._selector.close()
 
-def _serve_file(handler, file_path, content_type, log_emoji, log_description):
-    """Serve a static file with proper headers"""
-    client_ip = handler.client_address[0]
-    log_message('INFO', f'{log_emoji} {log_description} to {client_ip}')
-    handler.send_response(200)
-    handler.send_header('Content-type', content_type)
-    handler.end_headers()
-    with open(file_path, 'r') as f:
-        handler.wfile.write(f.read().encode())
+    def server_close(self):
+        super().server_close()
+        self._closing = True
+        self._wake()
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
-def _serve_models_json(handler):
-    """Serve the models list as JSON"""
-    global available_models
-    client_ip = handler.client_address[0]
-    log_message('INFO', f'📋 Serving models list to {client_ip}', {
-        'Available models': len(available_models)
-    })
-    handler.send_response(200)
-    handler.send_header('Content-type', 'application/json')
-    handler.end_headers()
-    handler.wfile.write(json.dumps({'models': available_models}).encode())
+class ChatHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 enables keep-alive; every response must carry a Content-Length
+    protocol_version = 'HTTP/1.1'
+    # A client that stalls in the middle of a request gives up its worker after this many seconds
+    timeout = HTTP_KEEPALIVE_TIMEOUT
 
-def _serve_progress_json(handler):
-    """Serve the current progress as JSON"""
-    global current_progress
-    client_ip = handler.client_address[0]
+    def handle(self):
+        # One request per turn; the server parks keep-alive connections between requests
+        self.close_connection = True
+        self.handle_one_request()
+        if self.event_stream is not None:
+            # Hand over only after handle_one_request's final flush
+            event_streams.add(self, *self.event_stream)
+            self.event_stream = None
 
-    # Calculate elapsed time if processing
-    progress_copy = current_progress.copy()
-    if progress_copy['start_time']:
-        progress_copy['elapsed_time'] = int(time.time() - progress_copy['start_time'])
-    else:
-        progress_copy['elapsed_time'] = 0
+    # Set once an event stream takes over the connection
+    detached = False
+    event_stream = None  # (job_id, job, next_event_index) waiting to be handed to the hub
+    body_unread = False  # set when a response leaves the request body on the socket
 
-    # Remove start_time from response (not needed on frontend)
-    progress_copy.pop('start_time', None)
+    def finish(self):
+        # A kept-alive connection stays open for its next turn
+        if self.close_connection and not self.detached:
+            super().finish()
 
-    handler.send_response(200)
-    handler.send_header('Content-type', 'application/json')
-    handler.end_headers()
-    handler.wfile.write(json.dumps(progress_copy).encode())
+    def do_GET(self):
+        self._dispatch(self._route_get)
 
-def _serve_job_status(handler, job_id):
-    """Serve job status as JSON"""
-    client_ip = handler.client_address[0]
-    job = get_job(job_id)
+    def do_POST(self):
+        self._dispatch(self._route_post)
 
-    if not job:
-        handler.send_response(404)
-        handler.send_header('Content-type', 'application/json')
-        handler.end_headers()
-        handler.wfile.write(json.dumps({'error': 'Job not found'}).encode())
-        return
+    def do_DELETE(self):
+        self._dispatch(self._route_delete)
 
-    # Create response without internal fields
-    response = {
-        'id': job['id'],
-        'status': job['status'],
-        'created_at': job['created_at']
-    }
+    def log_message(self, format, *args):
+        # Access log lines are dominated by status and progress polls
+        log_message('INFO', f'↔️  {self.address_string()} {format % args}', sampled=True)
 
-    if job['status'] == 'completed' and job['result']:
-        response['result'] = job['result']
-    elif job['status'] == 'error' and job['error']:
-        response['error'] = job['error']
+    def log_error(self, format, *args):
+        log_message('WARNING', f'⚠️  {self.address_string()} {format % args}')
 
-    handler.send_response(200)
-    handler.send_header('Content-type', 'application/json')
-    handler.end_headers()
-    handler.wfile.write(json.dumps(response).encode())
+    def send_response(self, code, message=None):
+        self._status_code = code
+        super().send_response(code, message)
+        if self.body_unread:
+            self.send_header('Connection', 'close')
 
-def _serve_404(handler):
-    """Serve 404 error response"""
-    client_ip = handler.client_address[0]
-    log_message('WARNING', f'❓ 404 request from {client_ip}: {handler.path}')
-    handler.send_response(404)
-    handler.end_headers()
+    def _dispatch(self, route):
+        """Run a route and record its latency under a low-cardinality route label"""
+        self._status_code = 0
+        start_time = time.perf_counter()
+        try:
+            route()
+        finally:
+            metrics.observe('chat_http_request_seconds', time.perf_counter() - start_time,
+                            method=self.command, route=_route_label(self.path), status=self._status_code)
 
-class ChatHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
+    def _route_get(self):
         if self.path == '/':
-            _serve_file(self, 'index.html', 'text/html', '🌐', 'Serving main page')
+            _serve_file(self, '/', '🌐', 'Serving main page')
         elif self.path == '/style.css':
-            _serve_file(self, 'style.css', 'text/css', '🎨', 'Serving CSS')
+            _serve_file(self, '/style.css', '🎨', 'Serving CSS')
+        elif self.path in SENDFILE_FILES:
+            _serve_sendfile(self, self.path)
         elif self.path == '/models':
             _serve_models_json(self)
         elif self.path == '/progress':
             _serve_progress_json(self)
+        elif self.path == '/models/stats':
+            _send_json_response(self, model_stats.snapshot(), 200)
+        elif self.path == '/metrics':
+            _serve_metrics(self)
+        elif self.path == '/cache/stats':
+            _send_json_response(self, {
+                **response_cache.stats(),
+                'coalesced': generation_flights.coalesced
+            }, 200)
         elif self.path.startswith('/job/'):
-            job_id = self.path[5:]  # Remove '/job/' prefix
-            _serve_job_status(self, job_id)
+            url = urlparse(self.path)
+            job_path = url.path[5:]  # Remove '/job/' prefix
+            if job_path.endswith('/events'):
+                _serve_job_events(self, job_path[:-len('/events')])
+            elif job_path.endswith('/progress'):
+                _serve_progress_json(self, job_path[:-len('/progress')])
+            elif job_path.endswith('/trace'):
+                trace_format = parse_qs(url.query).get('format', ['json'])[0]
+                _serve_job_trace(self, job_path[:-len('/trace')], trace_format)
+            else:
+                _serve_job_status(self, job_path)
         else:
             _serve_404(self)
 
-    def do_POST(self):
+    def _route_post(self):
         if self.path == '/chat':
             _handle_chat_request(self)
+        elif self.path == '/chat/batch':
+            _handle_chat_batch_request(self)
+        else:
+            _serve_404(self)
+
+    def _route_delete(self):
+        if self.path.startswith('/job/') and '/' not in self.path[5:]:
+            _close_if_body_unread(self)
+            _handle_cancel_request(self, self.path[5:])
+        else:
+            _serve_404(self)
 
 def _parse_chat_request(handler):
     """Parse and validate chat request data"""
     content_length = int(handler.headers['Content-Length'])
     post_data = handler.rfile.read(content_length)
-    data = json.loads(post_data.decode('utf-8'))
+    return _chat_request_from_data(json.loads(post_data.decode('utf-8')))
 
+def _chat_request_from_data(data):
+    """Build request data from a decoded /chat body"""
+    message = data.get('message', '')
     return {
-        'user_message': data.get('message', '').strip(),
+        # Left as-is when not a string, so validation can reject it
+        'user_message': message.strip() if isinstance(message, str) else message,
+        # Clients without a session start a new conversation
+        'session_id': data.get('session_id') or str(uuid.uuid4()),
         'selected_models': data.get('selected_models', []),
-        'combiner_model': data.get('combiner_model', {})
+        'combiner_model': data.get('combiner_model', {}),
+        'completion_policy': data.get('completion_policy') or {}
     }
 
 def _validate_chat_request(request_data):
-    """Validate chat request and return error message if invalid"""
-    if not request_data['user_message']:
+    """Validate chat request and return error message if invalid
+
+    Selected and combiner models are swapped for their catalog entries, so
+    models the server does not serve never reach the scheduler, the model
+    stats or metric labels.
+    """
+    if not isinstance(request_data['user_message'], str):
+        return 'Message must be a string'
+    elif not request_data['user_message']:
         return 'Message cannot be empty'
+    elif not isinstance(request_data['selected_models'], list):
+        return 'Selected models must be a list'
     elif not request_data['selected_models']:
         return 'No models selected'
     elif not request_data['combiner_model']:
         return 'No combiner model selected'
-    return None
+    elif not isinstance(request_data['session_id'], str) or len(request_data['session_id']) > 128:
+        return 'Invalid session id'
+    elif not isinstance(request_data['completion_policy'], dict):
+        return 'Completion policy must be an object'
+
+    catalog = {(m['provider'], m['model']): m for m in available_models}
+    resolved = []
+    for model in request_data['selected_models'] + [request_data['combiner_model']]:
+        key = (model.get('provider'), model.get('model')) if isinstance(model, dict) else None
+        if key not in catalog:
+            return f'Unknown model: {key[0]}/{key[1]}' if key else 'Models must be objects'
+        resolved.append(catalog[key])
+    request_data['selected_models'], request_data['combiner_model'] = resolved[:-1], resolved[-1]
+    return _completion_policy_error(request_data['completion_policy'], len(request_data['selected_models']))
+
+def _shingles(text):
+    """Get the set of lowercase word n-grams in a text"""
+    words = re.findall(r'\w+', text.lower())
+    size = REDUCTION_SHINGLE_SIZE
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _jaccard(a, b):
+    """Get the Jaccard similarity of two sets"""
+    union = len(a | b)
+    return len(a & b) / union if union else 1.0
+
+def _fair_share_lengths(lengths, max_chars):
+    """Split a character budget so short texts stay whole and long ones share the rest"""
+    allowed = [0] * len(lengths)
+    remaining = max_chars
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    for position, index in enumerate(order):
+        share = remaining // (len(order) - position)
+        allowed[index] = min(lengths[index], share)
+        remaining -= allowed[index]
+    return allowed
+
+def reduce_responses(results):
+    """Collapse near-duplicate responses and cap their total size for a combiner prompt
+
+    Responses are clustered greedily by word-shingle Jaccard similarity. Each
+    cluster keeps its longest response, annotated with the other models that
+    said nearly the same thing, and representatives are truncated to share
+    COMBINE_MAX_PROMPT_CHARS. Returns the representatives and statistics.
+    """
+    start_time = time.perf_counter()
+    clusters = []  # [shingles of the first member, members]
+    for result in results:
+        shingles = _shingles(result['response'])
+        for cluster in clusters:
+            if RESPONSE_REDUCTION and _jaccard(shingles, cluster[0]) >= REDUCTION_SIMILARITY:
+                cluster[1].append(result)
+                break
+        else:
+            clusters.append([shingles, [result]])
+
+    representatives = []
+    for _, members in clusters:
+        representative = max(members, key=lambda r: len(r['response']))
+        representatives.append(dict(representative, similar_models=[
+            m['model']['display_name'] for m in members if m is not representative
+        ]))
+
+    allowed = _fair_share_lengths([len(r['response']) for r in representatives], COMBINE_MAX_PROMPT_CHARS)
+    for representative, limit in zip(representatives, allowed):
+        if len(representative['response']) > limit:
+            marker = ' [truncated]'
+            representative['response'] = representative['response'][:max(0, limit - len(marker))].rstrip() + marker
+
+    input_chars = sum(len(r['response']) for r in results)
+    output_chars = sum(len(r['response']) for r in representatives)
+    return representatives, {
+        'responses': len(results),
+        'clusters': len(representatives),
+        'input_chars': input_chars,
+        'output_chars': output_chars,
+        'time_ms': round((time.perf_counter() - start_time) * 1000, 2)
+    }
+
+def record_reduction(job_id, stats):
+    """Add a reduction's statistics to the job's running totals"""
+    job = get_live_job(job_id)
+    if not job:
+        return
+    with job['events_cond']:
+        totals = job['progress']['reduction'] or {}
+        for key, value in stats.items():
+            totals[key] = round(totals.get(key, 0) + value, 2)
+        totals['reduction_ratio'] = round(1 - totals['output_chars'] / totals['input_chars'], 4) if totals['input_chars'] else 0.0
+        job['progress']['reduction'] = totals
+    job_store.checkpoint(job_id)
+
+def _format_model_response(result):
+    """Format one, possibly clustered, model response for a combiner prompt"""
+    header = f"Model: {result['model']['display_name']}"
+    if result.get('similar_models'):
+        header += f" (near-identical responses also from: {', '.join(result['similar_models'])})"
+    return f"{header}\nResponse: {result['response']}"
 
 def _create_combining_prompt(user_message, successful_results):
     """Create the prompt for combining multiple model responses"""
-    model_responses = []
-    for result in successful_results:
-        model_responses.append(f"Model: {result['model']['display_name']}\nResponse: {result['response']}")
+    model_responses = [_format_model_response(result) for result in successful_results]
 
     return f"""Analyze the following responses from different AI models and provide a concise, structured summary that prioritizes the most valuable information:
 
@@ -434,33 +3324,228 @@ IMPORTANT GUIDELINES:
 - Prioritize quality over quantity - better to have fewer, more valuable insights than many trivial ones
 - Do not repeat information already covered in the main summary"""
 
-def _combine_responses_with_model(combiner_model, combiner_chat_history):
+def _combine_responses_with_model(combiner_model, combiner_chat_history, job_id=None):
     """Use combiner model to synthesize responses"""
-    global current_progress
 
     combiner_name = f"{combiner_model['provider']}/{combiner_model['model']}"
     log_message('INFO', f'🔗 Combining responses with {combiner_name}...')
 
     # Update progress to combining stage
-    current_progress['current_stage'] = 'combining'
+    update_job_progress(job_id, current_stage='combining')
+    publish_job_event(job_id, 'stage', {'stage': 'combining', 'combiner_model': combiner_name})
+
+    return _generate_combined_response(combiner_model, combiner_chat_history, job_id)
+
+def _generate_combined_response(combiner_model, combiner_chat_history, job_id=None):
+    """Run the combiner model, streaming its output to the job's subscribers"""
+    combiner_name = f"{combiner_model['provider']}/{combiner_model['model']}"
+
+    def publish_delta(text):
+        publish_job_event(job_id, 'combiner_delta', {'text': text})
 
     start_combine_time = time.time()
-    combined_response = px.generate_text(
-        system="You are an expert AI response analyzer focused on extracting maximum value from multiple model outputs. Your key responsibilities: 1) Identify and summarize the consensus among models, 2) Filter out redundant or low-value information, 3) Only highlight truly valuable unique insights that add significant meaning beyond the consensus. Be selective and quality-focused - it's better to omit trivial contributions than to overcrowd the response. Prioritize clarity, conciseness, and genuine value.",
-        messages=combiner_chat_history,
-        provider_model=(combiner_model['provider'], combiner_model['model']),
-        max_tokens=800,
-        temperature=0.7
-    )
-    combine_time = round(time.time() - start_combine_time, 2)
+    try:
+        with trace_span('combiner', model=combiner_name,
+                        prompt_chars=sum(len(m['content']) for m in combiner_chat_history)):
+            combined_response, reused = _generate_text_cached(
+                publish_delta if job_id is not None else None,
+                system="You are an expert AI response analyzer focused on extracting maximum value from multiple model outputs. Your key responsibilities: 1) Identify and summarize the consensus among models, 2) Filter out redundant or low-value information, 3) Only highlight truly valuable unique insights that add significant meaning beyond the consensus. Be selective and quality-focused - it's better to omit trivial contributions than to overcrowd the response. Prioritize clarity, conciseness, and genuine value.",
+                messages=combiner_chat_history,
+                provider_model=(combiner_model['provider'], combiner_model['model']),
+                max_tokens=800,
+                temperature=0.7
+            )
+            annotate_span(reused=reused, response_chars=len(combined_response))
+    except Exception:
+        _record_generation_metrics('combiner', combiner_name, time.time() - start_combine_time,
+                                   'error', combiner_chat_history)
+        raise
+    elapsed = time.time() - start_combine_time
+    _record_generation_metrics('combiner', combiner_name, elapsed,
+                               'reused' if reused else 'success', combiner_chat_history, combined_response)
+    combine_time = round(elapsed, 2)
 
     log_message('SUCCESS', f'✨ Response combination completed!', {
         'Combiner time': f'{combine_time}s',
+        'Reused': reused,
         'Final response length': f'{len(combined_response)} chars'
     })
 
     return combined_response
 
+def _create_merge_prompt(user_message, current_answer, new_results):
+    """Create the prompt for folding newly arrived model responses into a synthesized answer"""
+    model_responses = [_format_model_response(result) for result in new_results]
+
+    return f"""Below is a synthesized answer built from several AI models' responses, followed by responses from additional models that arrived afterwards. Update the synthesized answer to account for the new responses.
+
+Query: {user_message}
+
+Current synthesized answer:
+{current_answer}
+
+Additional Model Responses:
+{chr(10).join(model_responses)}
+
+IMPORTANT GUIDELINES:
+- Keep the same format as the current synthesized answer
+- Revise the summary only where the new responses change the consensus
+- Add a new model to "Additional valuable insights" only if it contributes genuinely valuable unique information
+- Do not repeat information already covered
+- Return only the updated answer"""
+
+# Long-lived threads so progressive combiner passes reuse their ProxAI connections.
+# Each running job holds one for its whole fan-out, and batch jobs run alongside
+# the chat jobs, so there is one per job slot of either kind.
+progressive_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=JOB_MAX_CONCURRENT + BATCH_MAX_CONCURRENT,
+    thread_name_prefix='progressive-combine'
+)
+
+class ProgressiveCombiner:
+    """Folds model responses into a running synthesis while the fan-out continues
+
+    The first pass combines the first batch of successful responses. Every
+    later pass merges the responses that arrived in the meantime into the
+    current answer, which is published to the job as a provisional result.
+    Once the fan-out is over, finish() waits for the pass that includes the
+    last response and returns the final answer, or None if a pass failed so
+    the caller can fall back to a single full combine. No new pass starts
+    once cancel_event is set.
+    """
+
+    def __init__(self, job_id, combiner_model, user_message, build_history, first_batch, cancel_event=None):
+        self.job_id = job_id
+        self.combiner_model = combiner_model
+        self.user_message = user_message
+        self.build_history = build_history  # prompt -> combiner chat history ending with the prompt
+        self.first_batch = first_batch
+        self.cancel_event = cancel_event or threading.Event()
+        self.answer = None
+        self.included = []  # results folded into the answer
+        self.passes = 0
+        self._cond = threading.Condition()
+        self._pending = []
+        self._done = False
+        self._future = progressive_executor.submit(traced(self._run, 'progressive_combiner'))
+
+    def add(self, result):
+        """Queue a resolved fan-out result for the next pass"""
+        if not result['success']:
+            return
+        with self._cond:
+            self._pending.append(result)
+            self._cond.notify()
+
+    def finish(self):
+        """Stop accepting results and wait for the final synthesis"""
+        with self._cond:
+            self._done = True
+            self._cond.notify()
+            final_pass_pending = bool(self._pending) or self.passes > 0
+        if final_pass_pending and not self.cancel_event.is_set():
+            update_job_progress(self.job_id, current_stage='combining')
+            publish_job_event(self.job_id, 'stage', {
+                'stage': 'combining',
+                'combiner_model': _model_name(self.combiner_model)
+            })
+        return self._future.result()
+
+    def _ready(self):
+        if self.answer is None:
+            return len(self._pending) >= self.first_batch
+        return bool(self._pending)
+
+    def _run(self):
+        ensure_proxai_connection()
+        while True:
+            with self._cond:
+                while not (self._done or self._ready()):
+                    self._cond.wait()
+                batch, self._pending = self._pending, []
+            if self.cancel_event.is_set():
+                return None
+            if not batch:
+                return self.answer
+
+            self.passes += 1
+            with trace_span('combiner_pass', index=self.passes, new_responses=len(batch)):
+                with trace_span('reduce'):
+                    reduced, stats = reduce_responses(batch)
+                record_reduction(self.job_id, stats)
+                with trace_span('prompt'):
+                    if self.answer is None:
+                        prompt = _create_combining_prompt(self.user_message, reduced)
+                    else:
+                        prompt = _create_merge_prompt(self.user_message, self.answer, reduced)
+                    history = self.build_history(prompt)
+
+                publish_job_event(self.job_id, 'combiner_pass', {
+                    'pass': self.passes,
+                    'models_included': len(self.included) + len(batch)
+                })
+                try:
+                    self.answer = _generate_combined_response(self.combiner_model, history, self.job_id)
+                except Exception as e:
+                    check_proxai_connection_error(e)
+                    log_message('ERROR', f'❌ Progressive combiner pass {self.passes} failed: {str(e)}')
+                    return None
+            self.included.extend(batch)
+
+            update_job_progress(self.job_id, provisional_result=self.answer)
+            publish_job_event(self.job_id, 'provisional', {
+                'result': self.answer,
+                'pass': self.passes,
+                'models': [_model_name(r['model']) for r in self.included]
+            })
+            log_message('INFO', f'🧩 Progressive pass {self.passes} folded in {len(batch)} responses', {
+                'Models included': len(self.included)
+            })
+
+def history_token_budget(model):
+    """Get the history token budget for a model's provider"""
+    return history_token_budgets.get(model['provider'], HISTORY_TOKEN_BUDGET)
+
+def _summarize_history(summarizer_model, messages):
+    """Summarize a run of conversation turns"""
+    # Runs on a model query thread, which needs its own ProxAI connection
+    ensure_proxai_connection()
+    transcript = '\n\n'.join(f"{m['role'].title()}: {m['content']}" for m in messages)
+    summary, _ = _generate_text_cached(
+        None,
+        system="You summarize conversations. Preserve facts, decisions, user preferences and open questions. Be concise.",
+        messages=[{"role": "user", "content": f"Summarize this part of our conversation in under 200 words:\n\n{transcript}"}],
+        provider_model=(summarizer_model['provider'], summarizer_model['model']),
+        max_tokens=400,
+        temperature=0.3
+    )
+    return summary
+
+def maybe_summarize_session(session_id, summarizer_model):
+    """Fold a session's older turns into a summary in the background"""
+    if HISTORY_SUMMARY_TRIGGER_TOKENS <= 0:
+        return
+
+    claim = session_store.claim_for_summary(
+        session_id, HISTORY_SUMMARY_TRIGGER_TOKENS, HISTORY_KEEP_RECENT_MESSAGES)
+    if claim is None:
+        return
+
+    last_seq, messages = claim
+    log_message('INFO', f'📝 Summarizing {len(messages)} older messages in session {session_id}')
+
+    def on_done(future):
+        try:
+            summary = future.result()
+        except Exception as e:
+            log_message('WARNING', f'⚠️  History summarization failed: {str(e)}')
+            summary = None
+        session_store.store_summary(session_id, last_seq, summary)
+
+    future = model_query_scheduler.submit(
+        summarizer_model['provider'], _summarize_history, summarizer_model, messages)
+    future.add_done_callback(on_done)
+
 def _fallback_to_random_response(successful_results):
     """Select a random response when combiner fails"""
     log_message('WARNING', '🔄 Falling back to random response selection...')
@@ -476,17 +3561,33 @@ def _fallback_to_random_response(successful_results):
     return chosen_response
 
 def _process_chat_models_async(job_id, request_data):
-    """Process chat request with multiple models asynchronously"""
-    global chat_history
+    """Process chat request with multiple models asynchronously, tracing its stages"""
+    job = get_live_job(job_id)
+    trace = job['trace'] if job else None
+    if trace is None:
+        _run_chat_job(job_id, request_data)
+        return
+
+    trace.record('queued', trace.root, trace.root['start'], time.time())
+    with activate_trace(trace, trace.root):
+        try:
+            _run_chat_job(job_id, request_data)
+        finally:
+            trace.end(trace.root, status=(get_job(job_id) or {}).get('status'))
+            job_store.save_trace(job_id)
+            export_job_trace(trace)
 
+def _run_chat_job(job_id, request_data):
+    """Run a chat job from the fan-out to the combined answer"""
     try:
-        # Ensure ProxAI connection in thread for multiprocessing compatibility
-        px.connect(
-            experiment_path='multi_model_chat/version_1',
-            proxdash_options=px.ProxDashOptions(
-                api_key=os.getenv('PROXDASH_API_KEY'),
-            ))
-        update_job(job_id, status='processing')
+        # A job cancelled while it waited for a slot never starts
+        if not advance_job(job_id, 'processing'):
+            log_message('INFO', f'⏭️  Skipping job {job_id}, it was cancelled while queued')
+            return
+        cancel_event = get_live_job(job_id)['cancel_event']
+
+        # Reuse this job thread's ProxAI connection for the combiner call
+        ensure_proxai_connection()
 
         user_message = request_data['user_message']
         selected_models = request_data['selected_models']
@@ -498,20 +3599,68 @@ def _process_chat_models_async(job_id, request_data):
             'Combiner model': f"{combiner_model['provider']}/{combiner_model['model']}"
         })
 
-        chat_history.append({"role": "user", "content": user_message})
+        session_id = request_data['session_id']
+        session_store.append(session_id, 'user', user_message)
+
+        # Each model gets the recent history that fits its token budget
+        with trace_span('history'):
+            windows = {}  # budget -> history window, shared by models with equal budgets
+            model_histories = {}
+            for model in selected_models:
+                budget = history_token_budget(model)
+                if budget not in windows:
+                    windows[budget] = session_store.build_context(session_id, budget)
+                model_histories[_model_name(model)] = windows[budget]
+            chat_history = session_store.build_context(session_id, HISTORY_TOKEN_BUDGET)
+
+        def build_combiner_history(prompt):
+            # The combiner's history window shrinks by the size of the prompt itself
+            budget = max(0, history_token_budget(combiner_model) - estimate_tokens(prompt))
+            history = session_store.build_context(session_id, budget)
+            history.append({"role": "user", "content": prompt})
+            return history
+
+        # Optionally start synthesizing while slower models are still answering
+        policy = _create_completion_policy(request_data.get('completion_policy'))
+        progressive = None
+        if policy['progressive']:
+            progressive = ProgressiveCombiner(job_id, combiner_model, user_message, build_combiner_history,
+                                              policy['progressive_first_batch'], cancel_event)
 
         # Query selected models in parallel
         start_total_time = time.time()
-        results = query_all_models_parallel(selected_models, user_message, chat_history)
+        try:
+            with trace_span('fan_out', models=len(selected_models)):
+                results = query_all_models_parallel(
+                    selected_models, user_message, chat_history,
+                    job_id=job_id,
+                    completion_policy=request_data.get('completion_policy'),
+                    model_histories=model_histories,
+                    on_result=progressive.add if progressive else None,
+                    cancel_event=cancel_event
+                )
+        finally:
+            # Always release the combiner pass thread, even if the fan-out raised
+            combined_response = None
+            if progressive:
+                with trace_span('progressive_finish'):
+                    combined_response = progressive.finish()
         total_time = round(time.time() - start_total_time, 2)
 
+        if cancel_event.is_set():
+            log_message('INFO', f'🛑 Job {job_id} stopped after the fan-out, skipping the combine')
+            return
+
         # Filter successful responses
         successful_results = [r for r in results if r['success']]
         failed_results = [r for r in results if not r['success']]
 
         if not successful_results:
             log_message('ERROR', '💥 All models failed to respond!')
-            update_job(job_id, status='error', error='All models failed to respond')
+            update_job_progress(job_id, current_stage='idle', is_processing=False)
+            if advance_job(job_id, 'error', ('job_failed', {'error': 'All models failed to respond'}),
+                           error='All models failed to respond'):
+                metrics.inc('chat_jobs_total', outcome='failed')
             return
 
         log_message('SUCCESS', f'🎯 Preparing response combination', {
@@ -519,53 +3668,154 @@ def _process_chat_models_async(job_id, request_data):
             'Failed responses': len(failed_results)
         })
 
-        # Create combining prompt and get combined response
-        combining_prompt = _create_combining_prompt(user_message, successful_results)
-        combiner_chat_history = chat_history + [{"role": "user", "content": combining_prompt}]
+        # Progressive mode already folded every response in unless a pass failed
+        if combined_response is None:
+            with trace_span('reduce', responses=len(successful_results)):
+                reduced_results, reduction = reduce_responses(successful_results)
+            record_reduction(job_id, reduction)
+            log_message('INFO', f'🗜️  Reduced {reduction["responses"]} responses to {reduction["clusters"]} for the combiner', {
+                'Prompt chars': f'{reduction["input_chars"]} → {reduction["output_chars"]}',
+                'Time': f'{reduction["time_ms"]}ms'
+            })
+            with trace_span('prompt'):
+                combiner_history = build_combiner_history(_create_combining_prompt(user_message, reduced_results))
+            try:
+                combined_response = _combine_responses_with_model(combiner_model, combiner_history, job_id=job_id)
+            except Exception as e:
+                check_proxai_connection_error(e)
+                log_message('ERROR', f'❌ Combiner model failed: {str(e)}')
+                combined_response = _fallback_to_random_response(successful_results)
 
-        try:
-            combined_response = _combine_responses_with_model(combiner_model, combiner_chat_history)
-        except Exception as e:
-            log_message('ERROR', f'❌ Combiner model failed: {str(e)}')
-            combined_response = _fallback_to_random_response(successful_results)
+        if cancel_event.is_set():
+            log_message('INFO', f'🛑 Job {job_id} cancelled while combining, discarding the answer')
+            return
 
         # Mark processing as completed
-        current_progress.update({
-            'current_stage': 'completed',
-            'is_processing': False
-        })
+        update_job_progress(job_id, current_stage='completed', is_processing=False)
 
-        chat_history.append({"role": "assistant", "content": combined_response})
-        update_job(job_id, status='completed', result=combined_response)
+        session_store.append(session_id, 'assistant', combined_response)
+        maybe_summarize_session(session_id, combiner_model)
+        if not advance_job(job_id, 'completed', ('job_completed', {'result': combined_response}),
+                           result=combined_response):
+            return
+        metrics.inc('chat_jobs_total', outcome='completed')
 
         log_message('SUCCESS', f'✅ Job {job_id} completed successfully')
 
     except Exception as e:
         log_message('ERROR', f'❌ Job {job_id} failed: {str(e)}')
-        update_job(job_id, status='error', error=str(e))
         # Reset progress on error
-        current_progress.update({
-            'current_stage': 'idle',
-            'is_processing': False
-        })
+        update_job_progress(job_id, current_stage='idle', is_processing=False)
+        if advance_job(job_id, 'error', ('job_failed', {'error': str(e)}), error=str(e)):
+            metrics.inc('chat_jobs_total', outcome='failed')
+
+def export_job_trace(trace):
+    """Write a finished job's trace to TRACE_EXPORT_DIR as a Chrome-trace file"""
+    if not TRACE_EXPORT_DIR:
+        return
+    path = os.path.join(TRACE_EXPORT_DIR, f'{trace.job_id}.trace.json')
+    try:
+        os.makedirs(TRACE_EXPORT_DIR, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(trace.to_chrome(), f)
+    except OSError as e:
+        log_message('WARNING', f'⚠️  Could not export trace for job {trace.job_id}: {str(e)}')
+
+def job_queue_position(job_id):
+    """Get a pending job's queue position in this process or the shared worker queue"""
+    position = job_scheduler.queue_position(job_id)
+    if not position and isinstance(job_store, SharedJobStore):
+        position = job_store.queue_position(job_id)
+    return position
+
+shared_job_wakeup = threading.Event()
+
+def _dispatch_shared_jobs():
+    """Claim jobs from the shared worker queue whenever this process has a free job slot"""
+    last_prune = time.time()
+    while True:
+        claimed = None
+        jobs = job_scheduler.snapshot()
+        if jobs['queued'] + jobs['running'] < job_scheduler.max_concurrent:
+            try:
+                claimed = job_store.claim()
+            except sqlite3.Error as e:
+                log_message('WARNING', f'⚠️  Could not claim from the shared job queue: {str(e)}')
+
+        if claimed:
+            # Keep the original creation time so the trace and metrics cover the shared queue wait
+            job_id, request_data, created_at = claimed
+            metrics.observe('chat_queue_wait_seconds', max(0.0, time.time() - created_at), queue='shared')
+            create_job(request_data, job_id=job_id, created_at=created_at)
+            job_scheduler.try_submit(job_id, _process_chat_models_async, request_data)
+            continue
+
+        # Apply DELETE requests that other workers received for jobs running here
+        try:
+            for job_id, reason in job_store.take_cancellations():
+                cancel_job(job_id, reason)
+        except sqlite3.Error as e:
+            log_message('WARNING', f'⚠️  Could not read shared job cancellations: {str(e)}')
+
+        if time.time() - last_prune >= SESSION_IDLE_TIMEOUT:
+            job_store.prune_session_owners()
+            last_prune = time.time()
+        shared_job_wakeup.wait(WORKER_POLL_INTERVAL)
+        shared_job_wakeup.clear()
+
+def start_shared_job_dispatcher():
+    """Start the thread that pulls shared queue jobs into this worker"""
+    thread = threading.Thread(target=_dispatch_shared_jobs, name='shared-job-dispatch', daemon=True)
+    thread.start()
+
+def _submit_job(request_data):
+    """Queue a job locally or on the shared worker queue, returning (job_id, position or None)"""
+    global latest_job_id
+    if isinstance(job_store, SharedJobStore):
+        job = _new_job(request_data)
+        queue_position = job_store.enqueue(job, JOB_MAX_QUEUED)
+        if queue_position is not None:
+            latest_job_id = job['id']
+            shared_job_wakeup.set()
+        return job['id'], queue_position
+
+    job_id = create_job(request_data)
+    queue_position = job_scheduler.try_submit(job_id, _process_chat_models_async, request_data)
+    if queue_position is None:
+        discard_job(job_id)
+    return job_id, queue_position
 
 def _process_chat_models(request_data):
     """Create async job and return job ID immediately"""
-    job_id = create_job(request_data)
+    # Hand the job to the scheduler, rejecting it when the queue is full
+    job_id, queue_position = _submit_job(request_data)
+    if queue_position is None:
+        metrics.inc('chat_jobs_total', outcome='rejected')
+        log_message('WARNING', '🚦 Job queue full, rejecting chat request', job_scheduler.snapshot())
+        return {
+            'error': 'Server is busy, please retry shortly',
+            'queue_length': job_scheduler.max_queued
+        }, 429
 
-    # Start processing in background thread
-    thread = threading.Thread(target=_process_chat_models_async, args=(job_id, request_data))
-    thread.daemon = True
-    thread.start()
+    if queue_position:
+        publish_job_event(job_id, 'stage', {'stage': 'queued', 'queue_position': queue_position})
 
-    return {'job_id': job_id}, 200
+    return {
+        'job_id': job_id,
+        'session_id': request_data['session_id'],
+        'queue_position': queue_position
+    }, 200
 
-def _send_json_response(handler, response_data, status_code):
+def _send_json_response(handler, response_data, status_code, headers=None):
     """Send JSON response with proper headers"""
+    body = json.dumps(response_data).encode()
     handler.send_response(status_code)
     handler.send_header('Content-type', 'application/json')
+    handler.send_header('Content-Length', str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
     handler.end_headers()
-    handler.wfile.write(json.dumps(response_data).encode())
+    handler.wfile.write(body)
 
 def _handle_chat_request(handler):
     """Handle the complete chat request flow"""
@@ -578,36 +3828,268 @@ def _handle_chat_request(handler):
             return
 
         response_data, status_code = _process_chat_models(request_data)
-        _send_json_response(handler, response_data, status_code)
+        headers = {'Retry-After': '5'} if status_code == 429 else None
+        _send_json_response(handler, response_data, status_code, headers)
 
     except Exception as e:
         log_message('ERROR', f'💥 Unexpected error in chat processing: {str(e)}')
         _send_json_response(handler, {'error': 'Failed to get AI response'}, 500)
 
+def _handle_cancel_request(handler, job_id):
+    """Cancel a job on behalf of DELETE /job/<id>"""
+    reason = 'Cancelled by client'
+    if get_live_job(job_id) is not None:
+        cancelled = cancel_job(job_id, reason)
+    elif isinstance(job_store, SharedJobStore):
+        # Queued on the shared queue or running in another worker
+        cancelled = job_store.request_cancel(job_id, reason)
+        shared_job_wakeup.set()
+    else:
+        cancelled = False
+
+    if cancelled:
+        _send_json_response(handler, {'id': job_id, 'status': 'cancelled'}, 200)
+        return
+
+    job = get_job(job_id)
+    if not job:
+        _send_json_response(handler, {'error': 'Job not found'}, 404)
+    else:
+        _send_json_response(handler, {'error': f"Job already {job['status']}", 'status': job['status']}, 409)
+
+batch_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=BATCH_MAX_CONCURRENT,
+    thread_name_prefix='chat-batch'
+)
+
+def _batch_request_from_entry(entry):
+    """Build request data for one batch prompt, defaulting to every available model"""
+    request_data = _chat_request_from_data(entry)
+    if not request_data['selected_models']:
+        request_data['selected_models'] = list(available_models)
+    if not request_data['combiner_model'] and isinstance(request_data['selected_models'], list):
+        request_data['combiner_model'] = request_data['selected_models'][0]
+    return request_data
+
+def _run_batch_item(item_id, job_id, request_data):
+    """Process one batch prompt as a regular job and summarize its outcome"""
+    start_time = time.time()
+    _process_chat_models_async(job_id, request_data)
+    job = get_job(job_id) or {}
+    result = {
+        'id': item_id,
+        'job_id': job_id,
+        'status': job.get('status'),
+        'time_taken': round(time.time() - start_time, 2)
+    }
+    if job.get('status') == 'completed':
+        result['result'] = job['result']
+    else:
+        result['error'] = job.get('error')
+    return result
+
+def run_chat_batch(entries):
+    """Run decoded batch prompts concurrently, yielding each result as it completes
+
+    Every prompt becomes a job on the batch pool; their model queries all go
+    through the shared ModelQueryScheduler, so provider limits still hold.
+    Entries that are not valid prompts yield an error result straight away.
+    """
+    futures = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            yield {'id': index, 'status': 'error', 'error': 'Each line must be a JSON object'}
+            continue
+
+        item_id = entry.get('id', index)
+        request_data = _batch_request_from_entry(entry)
+        error_message = _validate_chat_request(request_data)
+        if error_message:
+            yield {'id': item_id, 'status': 'error', 'error': error_message}
+            continue
+
+        job_id = create_job(request_data)
+        # Batch jobs have no poller; their results are streamed back as they finish
+        get_live_job(job_id)['idle_cancel'] = False
+        futures.append(batch_executor.submit(_run_batch_item, item_id, job_id, request_data))
+
+    log_message('INFO', f'📦 Running batch of {len(futures)} prompts', {
+        'Concurrent prompts': BATCH_MAX_CONCURRENT
+    })
+    for future in concurrent.futures.as_completed(futures):
+        yield future.result()
+
+def _parse_batch_lines(lines):
+    """Decode JSONL prompt lines, keeping undecodable lines as None"""
+    entries = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            entries.append(None)
+    return entries
+
+def _write_chunk(handler, data):
+    """Write one chunk of a chunked transfer-encoded response"""
+    handler.wfile.write(f'{len(data):X}\r\n'.encode() + data + b'\r\n')
+    handler.wfile.flush()
+
+def _handle_chat_batch_request(handler):
+    """Run a JSONL batch of prompts and stream JSONL results as they complete"""
+    content_length = int(handler.headers.get('Content-Length', 0))
+    try:
+        body = handler.rfile.read(content_length).decode('utf-8')
+    except UnicodeDecodeError:
+        _send_json_response(handler, {'error': 'Batch must be UTF-8 encoded'}, 400)
+        return
+    entries = _parse_batch_lines(body.splitlines())
+
+    if not entries:
+        _send_json_response(handler, {'error': 'Batch is empty'}, 400)
+        return
+    # Checked before the streamed 200; single bad lines get an error result instead
+    if not any(isinstance(entry, dict) for entry in entries):
+        _send_json_response(handler, {'error': 'Batch must be JSONL with one JSON object per line'}, 400)
+        return
+    if len(entries) > BATCH_MAX_ITEMS:
+        _send_json_response(handler, {'error': f'Batch exceeds {BATCH_MAX_ITEMS} prompts'}, 413)
+        return
+
+    client_ip = handler.client_address[0]
+    log_message('INFO', f'📦 Batch of {len(entries)} prompts from {client_ip}')
+
+    handler.send_response(200)
+    handler.send_header('Content-type', 'application/x-ndjson')
+    handler.send_header('Transfer-Encoding', 'chunked')
+    handler.end_headers()
+
+    try:
+        for result in run_chat_batch(entries):
+            _write_chunk(handler, json.dumps(result).encode() + b'\n')
+        handler.wfile.write(b'0\r\n\r\n')
+    except (BrokenPipeError, ConnectionResetError):
+        # Remaining prompts still finish and stay available at /job/<id>
+        handler.close_connection = True
+        log_message('INFO', f'🔌 Batch stream closed by {client_ip}')
+
+def load_available_models():
+    """Load models from the catalog snapshot, discovering them on first boot
+
+    Returns the delay before the next background refresh is due.
+    """
+    snapshot = load_model_catalog_snapshot()
+    if snapshot:
+        set_available_models(snapshot['models'])
+        snapshot_age = time.time() - snapshot.get('saved_at', 0)
+        log_message('SUCCESS', f'⚡ Loaded {len(available_models)} models from catalog snapshot', {
+            'Snapshot age': f'{int(snapshot_age)}s'
+        })
+        return max(0, MODEL_CATALOG_REFRESH_INTERVAL - snapshot_age)
+
+    # First boot: nothing to serve until discovery finishes
+    refresh_model_catalog()
+    return MODEL_CATALOG_REFRESH_INTERVAL
+
+def run_batch_cli(input_path, output_path, message_field, id_field):
+    """Run a JSONL prompt file through the batch pipeline without the HTTP server"""
+    # Results own stdout when it is the output, so logs move to stderr
+    if output_path == '-':
+        log_stream_handler.setStream(sys.stderr)
+
+    ensure_proxai_connection()
+    load_available_models()
+    if not available_models:
+        log_message('ERROR', '💥 No models available! Cannot run batch.')
+        return 1
+
+    with (sys.stdin if input_path == '-' else open(input_path)) as f:
+        entries = _parse_batch_lines(f)
+    for entry in entries:
+        if isinstance(entry, dict):
+            entry.setdefault('message', entry.get(message_field, ''))
+            if id_field in entry:
+                entry.setdefault('id', entry[id_field])
+
+    output = sys.stdout if output_path == '-' else open(output_path, 'w')
+    try:
+        for result in run_chat_batch(entries):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+def run_worker_processes():
+    """Run WORKER_PROCESSES server processes on one port, restarting any that exit"""
+    log_message('INFO', f'🚀 Starting {WORKER_PROCESSES} worker processes...', {
+        'Shared job store': job_store.path
+    })
+
+    # Discover once up front so every worker boots from the snapshot
+    if not load_model_catalog_snapshot():
+        refresh_model_catalog()
+
+    def spawn(index):
+        env = dict(os.environ, WORKER_INDEX=str(index))
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+
+    # Stop the workers on SIGTERM as well as Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    workers = [spawn(index) for index in range(WORKER_PROCESSES)]
+    try:
+        while True:
+            time.sleep(1)
+            for index, worker in enumerate(workers):
+                if worker.poll() is not None:
+                    log_message('ERROR', f'💥 Worker {index} exited with code {worker.returncode}, restarting')
+                    workers[index] = spawn(index)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log_message('INFO', '⏹️  Stopping worker processes...')
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
 def run_server():
-    global available_models
+    if WORKER_PROCESSES > 1 and WORKER_INDEX is None:
+        run_worker_processes()
+        return
+
     log_message('INFO', '🚀 Starting Multi-Model AI Chat Server...')
 
     # Initialize ProxAI connection with experiment tracking
-    px.connect(
-        experiment_path='multi_model_chat/version_1',
-        proxdash_options=px.ProxDashOptions(
-            api_key=os.getenv('PROXDASH_API_KEY'),
-        ))
+    ensure_proxai_connection()
     log_message('SUCCESS', '✅ ProxAI connection initialized with experiment tracking')
 
-    available_models = get_largest_models()
+    load_static_assets()
+
+    # Boot from the saved catalog and rediscover in the background
+    refresh_delay = load_available_models()
 
     if not available_models:
         log_message('ERROR', '💥 No models available! Cannot start server.')
         return
 
+    if MODEL_CATALOG_REFRESH_INTERVAL > 0:
+        start_model_catalog_refresher(refresh_delay)
+
+    if isinstance(job_store, SharedJobStore):
+        start_shared_job_dispatcher()
+    if JOB_IDLE_CANCEL > 0:
+        start_idle_job_reaper()
+
     server_address = ('localhost', 3000)
-    httpd = HTTPServer(server_address, ChatHandler)
+    httpd = BoundedThreadingHTTPServer(server_address, ChatHandler, reuse_port=WORKER_INDEX is not None)
 
     log_message('SUCCESS', f'🌟 Server ready and listening!', {
         'URL': 'http://localhost:3000',
         'Models loaded': len(available_models),
+        'HTTP workers': httpd.max_workers,
         'Ready for connections': True
     })
 
@@ -617,5 +4099,19 @@ def run_server():
         log_message('INFO', '⏹️  Server shutting down gracefully...')
         httpd.server_close()
 
-if __name__ == '__main__':
+def main():
+    parser = argparse.ArgumentParser(description='Multi-model AI chat server')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='Run a JSONL file of prompts ("-" for stdin) instead of serving')
+    parser.add_argument('--output', metavar='FILE', default='-',
+                        help='Where batch results are written as JSONL (default: stdout)')
+    parser.add_argument('--message-field', default='message', help='Prompt field in each batch line')
+    parser.add_argument('--id-field', default='id', help='Field echoed back as each result id')
+    args = parser.parse_args()
+
+    if args.batch:
+        sys.exit(run_batch_cli(args.batch, args.output, args.message_field, args.id_field))
     run_server()
+
+if __name__ == '__main__':
+    main()